@@ -1,14 +1,18 @@
 import datetime
-from flask import Flask, request, jsonify
+import hmac
+from flask import Flask, g, request, jsonify
 import jwt
+import math
 import mysql.connector
 import os
 import bcrypt
 import random
+import threading
+import time
 from dotenv import load_dotenv
 from functools import wraps
-from ml.itinerary.itinerary import generate_itinerary
-from ml.guides.guides import guides_recommendation
+from db import pool_from_env, pool_stats
+from ids import next_id
 
 load_dotenv('.env')
 
@@ -17,16 +21,92 @@ app = Flask(__name__)
 # Secret key for JWT
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 
-# Connect to the MySQL database
-db_connection = mysql.connector.connect(
-    host=os.getenv('DB_HOST'),
-    user=os.getenv('DB_USER'),
-    password=os.getenv('DB_PASSWORD'),
-    database=os.getenv('DB_NAME')
-)
-
-# Create a cursor to interact with the database
-db_cursor = db_connection.cursor(dictionary=True)
+# Connections come from pools created on the first request instead of at import time.
+# mysql.connector connections are not thread-safe, so each request checks out its own
+# connection on first use and returns it to the pool when the request ends.
+#
+# Reads go to the replica when DB_REPLICA_HOST is set (the other DB_REPLICA_* settings
+# default to the DB_* ones). Writes, and every query after the first write in the same
+# request, go to the primary so a request always reads its own writes. After a connect to
+# the replica fails, reads skip it for DB_REPLICA_COOLDOWN seconds instead of every request
+# waiting for another failed connect. A replica pool that is only busy (PoolTimeout) is not
+# treated as down.
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_COOLDOWN = float(os.getenv('DB_REPLICA_COOLDOWN', 30))
+replica_down_until = 0.0
+
+db_pools = {}
+db_pool_lock = threading.Lock()
+
+def get_db_pool(role):
+    pool = db_pools.get(role)
+    if pool is None:
+        with db_pool_lock:
+            pool = db_pools.get(role)
+            if pool is None:
+                pool = pool_from_env(role, 'DB' if role == 'primary' else 'DB_REPLICA')
+                db_pools[role] = pool
+    return pool
+
+def get_db(write=False):
+    global replica_down_until
+    if write:
+        g.db_wrote = True
+    use_replica = DB_REPLICA_HOST and not g.get('db_wrote') and time.monotonic() >= replica_down_until
+    role = 'replica' if use_replica else 'primary'
+
+    connections = g.setdefault('db_connections', {})
+    if role not in connections:
+        try:
+            connections[role] = get_db_pool(role).acquire()
+        except (mysql.connector.Error, OSError) as e:
+            if role == 'primary':
+                raise
+            # Reads keep working from the primary while the replica is unavailable
+            replica_down_until = time.monotonic() + DB_REPLICA_COOLDOWN
+            print(f"Replica unavailable, reading from primary for {DB_REPLICA_COOLDOWN:g}s: {e}")
+            return get_db(write=True)
+    return connections[role]
+
+# Buffered cursors read the whole result set on execute, so a fetchone() never leaves
+# unread rows behind that would break the next query on the same connection.
+# Handlers that write ask for write=True before their first query.
+def get_cursor(write=False):
+    return get_db(write).cursor(dictionary=True, buffered=True)
+
+# Discards the uncommitted writes of the current request, if any
+def rollback_db():
+    connection = g.get('db_connections', {}).get('primary')
+    if connection is not None:
+        connection.rollback()
+
+# Handlers turn database errors into 500 responses, so a failed request is recognised by
+# its status; its connections are checked before going back to the pool
+@app.after_request
+def note_failed_request(response):
+    if response.status_code >= 500:
+        g.db_failed = True
+    return response
+
+@app.teardown_appcontext
+def release_db(exception):
+    check = exception is not None or g.pop('db_failed', False)
+    for role, connection in g.pop('db_connections', {}).items():
+        get_db_pool(role).release(connection, check=check)
+
+# The recommenders pull in pandas, scikit-learn and the model weights, so they are
+# imported on first use (or by the App Engine warmup request) rather than at startup
+def load_recommenders():
+    from ml.itinerary.itinerary import get_engine as get_itinerary_engine
+    from ml.guides.guides import get_engine as get_guides_engine
+    from ml.nearby import get_event_locator
+
+    get_itinerary_engine()
+    get_guides_engine()
+    get_event_locator()
+
+if os.getenv('WARMUP_ON_START', '').lower() in ('1', 'true'):
+    load_recommenders()
 
 # Store active tokens (for authenticated users)
 active_tokens = set()
@@ -56,6 +136,12 @@ def jwt_required(func):
 
     return wrapper
 
+@app.route('/_ah/warmup', methods=['GET'])
+def warmup():
+    # Called by App Engine before an instance receives traffic
+    load_recommenders()
+    return '', 200
+
 @app.route('/auth/register', methods=['POST'])
 def register():
     try:
@@ -74,6 +160,7 @@ def register():
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
 
         # Check if user already exists
+        db_cursor = get_cursor(write=True)
         db_cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
         existing_user = db_cursor.fetchone()
 
@@ -88,11 +175,10 @@ def register():
 
         # Insert the user into the database
         db_cursor.execute("INSERT INTO users (name, email, phone_number, password, interests, created_at) VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)", (name, email, phone_number, hashed_password, interests))        
-        db_connection.commit()
+        get_db(write=True).commit()
 
         db_cursor.execute("SELECT created_at FROM users WHERE email = %s", (email,))
         created_at = db_cursor.fetchone()['created_at']
-        db_cursor.fetchall()
 
         # Generate JWT token
         token = jwt.encode({'email': email}, app.config['SECRET_KEY'], algorithm='HS256')
@@ -140,9 +226,9 @@ def login():
         password = data.get('password')
 
         # Query the database to find the user
+        db_cursor = get_cursor()
         db_cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
         user = db_cursor.fetchone()
-        db_cursor.fetchall()
 
         if user is None or not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
             # Unauthorized access (invalid email or password)
@@ -221,6 +307,7 @@ def account():
         email = request.decoded_token['email']
 
         # Query the database to get the user's account information based on the email
+        db_cursor = get_cursor()
         db_cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
         user = db_cursor.fetchone()
         print(user)
@@ -265,6 +352,7 @@ def account():
 def get_categories():
     try:
         # Query the database to get the categories
+        db_cursor = get_cursor()
         db_cursor.execute("SELECT id, name, image FROM category")
         categories = db_cursor.fetchall()
 
@@ -334,6 +422,7 @@ def get_pois():
             query_params += (offset,)
 
         # Execute the SQL query
+        db_cursor = get_cursor()
         db_cursor.execute(sql_query, query_params)
         pois = db_cursor.fetchall()
 
@@ -359,12 +448,78 @@ def get_pois():
         }
         return jsonify(response_data), 500
 
+# Largest radius in km and number of results accepted by /pois/nearby
+MAX_NEARBY_RADIUS = 500
+MAX_NEARBY_RESULTS = 100
+
+@app.route('/pois/nearby', methods=['GET'])
+@jwt_required
+def get_nearby():
+    from ml.itinerary.itinerary import get_engine as get_itinerary_engine
+    from ml.nearby import get_event_locator
+
+    try:
+        # Get the location, radius in km and maximum number of results from the query parameters
+        try:
+            lat = float(request.args['lat'])
+            lon = float(request.args['lon'])
+            radius = float(request.args.get('radius', 10))
+            size = int(request.args.get('size', 20))
+        except (KeyError, ValueError):
+            lat = None
+
+        if lat is None or not -90 <= lat <= 90 or not -180 <= lon <= 180 or not 0 < radius <= MAX_NEARBY_RADIUS or not 0 < size <= MAX_NEARBY_RESULTS:
+            response_data = {
+                "status": 400,
+                "message": f"lat and lon are required, radius must be between 0 and {MAX_NEARBY_RADIUS} km and size between 1 and {MAX_NEARBY_RESULTS}",
+                "data": None
+            }
+            return jsonify(response_data), 400
+
+        # POIs and events are looked up in the in-memory spatial index, nearest first
+        pois = [{
+            "id": poi['attraction_id'],
+            "name": poi['nama'],
+            "location": poi['kota'],
+            "image": poi['img'] if type(poi['img']) == str else None,
+            "distance_km": round(poi['jarak'], 2)
+        } for poi in get_itinerary_engine().nearby(lat, lon, radius, size)]
+
+        events = [{
+            "id": event['attraction_id'],
+            "name": event['nama'],
+            "location": event['kota'],
+            "date": event['date'],
+            "image": event['img'] if type(event['img']) == str else None,
+            "distance_km": round(event['jarak'], 2)
+        } for event in get_event_locator().nearby(lat, lon, radius, size)]
+
+        # Return the response as JSON
+        return jsonify({
+            "status": 200,
+            "message": "OK",
+            "data": {
+                "pois": pois,
+                "events": events
+            }
+        })
+
+    except Exception as e:
+        # Server error
+        response_data = {
+            "status": 500,
+            "message": f"Reason: {str(e)}",
+            "data": None
+        }
+        return jsonify(response_data), 500
+
 @app.route('/event/<int:id>', methods=['GET'])
 @jwt_required
 def get_event_detail(id):
     try:
         # Retrieve event detail from the database based on the provided ID
         query = "SELECT attraction_id, nama AS name, description, kota AS location, img AS image, date FROM events WHERE attraction_id = %s"
+        db_cursor = get_cursor()
         db_cursor.execute(query, (id,))
         event = db_cursor.fetchone()
 
@@ -447,6 +602,7 @@ def get_events():
             query_params += (offset,)
 
         # Execute the SQL query
+        db_cursor = get_cursor()
         db_cursor.execute(sql_query, query_params)
         events = db_cursor.fetchall()
 
@@ -509,6 +665,7 @@ def search():
             poi_query_params += (category_filter,)
 
         # Execute the SQL query to search for cities
+        db_cursor = get_cursor()
         db_cursor.execute(city_query, city_query_params)
         cities = db_cursor.fetchall()
 
@@ -551,6 +708,7 @@ def search():
 def discover():
     try:
         # Query the database to get the top-rated cities and POIs
+        db_cursor = get_cursor()
         db_cursor.execute("""
             SELECT MIN(p.id_kota) AS id, p.kota AS name, p.provinsi AS location, MIN(p.img) AS image, AVG(p.total_rating) AS total_rating
             FROM pois AS p
@@ -601,6 +759,7 @@ def get_poi():
         category = request.args.get('category')
 
         # Query the database to get the POIs based on the category
+        db_cursor = get_cursor()
         db_cursor.execute("SELECT attraction_id, nama AS name, kota AS location, img AS image FROM pois WHERE category = %s", (category,))
         pois = db_cursor.fetchall()
 
@@ -632,6 +791,7 @@ def get_poi_data(poi_id):
         # Query the database to get the POI detail based on the provided ID
         query = "SELECT attraction_id as id, nama AS name, kota AS location, img AS image, adult_price, child_price, CONCAT('The ', nama, ' is located at ', kota, '. This place has a unique story behind it. Lets check it out! #WisataNusantara') as background_story, longitude, latitude FROM pois WHERE attraction_id = %s"
         poi_params = (poi_id,)
+        db_cursor = get_cursor()
         db_cursor.execute(query, poi_params)
         poi = db_cursor.fetchone()
         
@@ -772,6 +932,7 @@ def get_cities():
             query_params += (offset,)
 
         # Execute the SQL query
+        db_cursor = get_cursor()
         db_cursor.execute(sql_query, query_params)
         cities = db_cursor.fetchall()
 
@@ -797,106 +958,394 @@ def get_cities():
         }
         return jsonify(response_data), 500
 
+# Apparently, the mobile app can't handle generated images, 
+# so we'll use a list of images instead
+GUIDES_IMAGE_MALE = [
+    "https://xsgames.co/randomusers/assets/avatars/male/43.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/male/37.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/male/24.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/male/38.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/male/70.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/male/35.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/male/69.jpg"
+]
+GUIDES_IMAGE_FEMALE = [
+    "https://xsgames.co/randomusers/assets/avatars/female/52.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/female/27.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/female/71.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/female/8.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/female/10.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/female/67.jpg",
+    "https://xsgames.co/randomusers/assets/avatars/female/77.jpg"
+]
+
+# Shape the guide recommendations the way the mobile app expects them
+def format_guides(guides_recommendations_raw):
+    guides_recommendations = []
+    for guide in guides_recommendations_raw:
+        # Strip PMD prefix from guide_id
+        guide_id = guide['Pemandu_ID'][3:]
+
+        # Determine the image list based on the gender
+        image_list = GUIDES_IMAGE_FEMALE if "female" in guide['Avatars'] else GUIDES_IMAGE_MALE
+
+        # Get a random image from the list
+        random_image = random.choice(image_list)
+
+        guides_recommendations.append({
+            "id": guide_id,
+            "name": guide['Nama_Pemandu'],
+            "price": guide['Price_per_hour'],
+            "image": random_image,
+            "time_duration_in_min": guide['Time_duration_in_min'],
+            "avg_star": guide['Rating']
+        })
+
+    return guides_recommendations
+
+# Group the itinerary records by day, every POI offering the recommended guides.
+# first_day numbers the days when the itinerary is one leg of a longer trip.
+def itinerary_days(itinerary_data, num_days, guides_recommendations, first_day=1):
+    itinerary_per_day = []
+    for day in range(1, num_days + 1):
+        poi_per_day = []
+        for poi in itinerary_data:
+            if poi['hari'] == day:
+                # The itinerary records are shared through the recommender cache, so don't modify them
+                image = poi['img']
+                if type(image) == float:
+                    image = 'https://dynamic-media-cdn.tripadvisor.com/media/photo-o/18/81/38/b5/saloka-memiliki-25-wahana.jpg?w=500&h=-1&s=1,110.458481,-7.2803431'
+                poi_data = {
+                    "id": poi['attraction_id'],
+                    "name": poi['nama'],
+                    "location": poi['kota'],
+                    "image": image,
+                    "tickets": {
+                        "is_ticketing_enabled": True,
+                        "adult_price": poi['adult_price'],
+                        "child_price": poi['child_price']
+                    },
+                    "guides": guides_recommendations
+                }
+                poi_per_day.append(poi_data)
+        day_data = {
+            "day": first_day + day - 1,
+            "poi": poi_per_day
+        }
+        itinerary_per_day.append(day_data)
+
+    return itinerary_per_day
+
+# Maximum number of days of an itinerary or of a whole multi-city trip
+MAX_ITINERARY_DAYS = 30
+
+# JSON integers only: not bools, floats or numeric strings
+def is_json_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
 @app.route('/city/<int:city_id>/itinerary', methods=['GET'])
 @jwt_required
 def get_itinerary(city_id):
+    from ml.itinerary.itinerary import generate_itinerary, get_engine as get_itinerary_engine
+    from ml.guides.guides import guides_recommendation
+
     try:
-        # Query the database to get the city name based on the city_id
-        db_cursor.execute("SELECT kota FROM pois WHERE id_kota = %s", (city_id,))
-        result = db_cursor.fetchone()
-        db_cursor.fetchall()
+        # Get the value of the 'days' query parameter
+        try:
+            num_days = int(request.args.get('days', 1))
+        except ValueError:
+            num_days = 0
+        if not 1 <= num_days <= MAX_ITINERARY_DAYS:
+            response_data = {
+                "status": 400,
+                "message": f"days must be an integer between 1 and {MAX_ITINERARY_DAYS}",
+                "data": None
+            }
+            return jsonify(response_data), 400
 
-        if not result:
-            # City not found
+        # Resolve the city name from the recommender's in-memory index, falling back
+        # to the database for cities that are not part of the recommender dataset
+        city_name = get_itinerary_engine().city_name(city_id)
+
+        if city_name is None:
+            db_cursor = get_cursor()
+            db_cursor.execute("SELECT kota FROM pois WHERE id_kota = %s", (city_id,))
+            result = db_cursor.fetchone()
+
+            if not result:
+                # City not found
+                response_data = {
+                    "status": 404,
+                    "message": "City not found",
+                    "data": None
+                }
+                return jsonify(response_data), 404
+
+            city_name = result['kota']
+
+        # Optional candidate filters: category, maximum adult price, already visited POIs
+        # (comma-separated ids), POIs in the same province as the city only and maximum
+        # distance from the city in km
+        max_price = request.args.get('max_price')
+        max_distance = request.args.get('max_distance')
+        exclude = request.args.get('exclude')
+        try:
+            filters = {
+                "category": request.args.get('category'),
+                "max_adult_price": int(max_price) if max_price else None,
+                "exclude_ids": [int(poi_id) for poi_id in exclude.split(',') if poi_id] if exclude else None,
+                "same_province": request.args.get('same_province', 'false').lower() == 'true',
+                "max_distance_km": float(max_distance) if max_distance else None
+            }
+        except ValueError:
+            filters = None
+
+        if filters is None or (filters['max_adult_price'] is not None and filters['max_adult_price'] < 0) or (filters['max_distance_km'] is not None and not 0 < filters['max_distance_km'] < math.inf):
+            response_data = {
+                "status": 400,
+                "message": "max_price must be a non-negative integer, max_distance a positive number of km and exclude comma-separated POI ids",
+                "data": None
+            }
+            return jsonify(response_data), 400
+
+        # Generate the itinerary data based on the city name and number of days
+        itinerary_data = generate_itinerary(city_name, num_days, **filters)
+
+        if not isinstance(itinerary_data, list):
+            # No POI left for the city after applying the filters
             response_data = {
                 "status": 404,
-                "message": "City not found",
+                "message": "No POIs found for the given city and filters",
                 "data": None
             }
             return jsonify(response_data), 404
 
-        city_name = result['kota']
+        guides_recommendations = format_guides(guides_recommendation(city_name))
 
-        # Get the value of the 'days' query parameter
-        num_days = int(request.args.get('days', 1))
+        # Divide the itinerary data into an array of days
+        itinerary_per_day = itinerary_days(itinerary_data, num_days, guides_recommendations)
 
-        # Generate the itinerary data based on the city name and number of days
-        itinerary_data = generate_itinerary(city_name, num_days)
+        # Return the response as JSON
+        return jsonify({
+            "status": 200,
+            "message": "OK",
+            "data": itinerary_per_day
+        })
 
-        guides_recommendations_raw = guides_recommendation(city_name).to_dict('records')
-        guides_recommendations = []
+    except Exception as e:
+        # Server error
+        response_data = {
+            "status": 500,
+            "message": f"Reason: {str(e)}",
+            "data": None
+        }
+        return jsonify(response_data), 500
 
-        # Apparently, the mobile app can't handle generated images, 
-        # so we'll use a list of images instead
-        guides_image_male = [
-            "https://xsgames.co/randomusers/assets/avatars/male/43.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/male/37.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/male/24.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/male/38.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/male/70.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/male/35.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/male/69.jpg"
-        ]
-        guides_image_female = [
-            "https://xsgames.co/randomusers/assets/avatars/female/52.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/female/27.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/female/71.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/female/8.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/female/10.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/female/67.jpg",
-            "https://xsgames.co/randomusers/assets/avatars/female/77.jpg"
-        ]
-        for guide in guides_recommendations_raw:
-            # Strip PMD prefix from guide_id
-            guide_id = guide['Pemandu_ID'][3:]
+# Maximum number of (city, days) pairs accepted by the batch itinerary endpoint
+MAX_BATCH_ITINERARIES = 20
 
-            # Determine the image list based on the gender
-            image_list = guides_image_female if "female" in guide['Avatars'] else guides_image_male
+@app.route('/itineraries', methods=['POST'])
+@jwt_required
+def get_itineraries():
+    from ml.itinerary.itinerary import generate_itineraries, get_engine as get_itinerary_engine
+    from ml.guides.guides import guides_recommendation
 
-            # Get a random image from the list
-            random_image = random.choice(image_list)
+    try:
+        # Body: {"cities": [{"id": <city_id>, "days": <number of days>}, ...]}
+        request_data = request.get_json(silent=True) or {}
+        try:
+            trips = [(int(trip['id']), int(trip.get('days', 1))) for trip in request_data.get('cities', [])]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            trips = None
 
-            guides_recommendations.append({
-                "id": guide_id,
-                "name": guide['Nama_Pemandu'],
-                "price": guide['Price_per_hour'],
-                "image": random_image,
-                "time_duration_in_min": guide['Time_duration_in_min'],
-                "avg_star": guide['Rating']
+        if not trips or len(trips) > MAX_BATCH_ITINERARIES or any(not 1 <= days <= MAX_ITINERARY_DAYS for _, days in trips):
+            response_data = {
+                "status": 400,
+                "message": f"Provide between 1 and {MAX_BATCH_ITINERARIES} cities, each with an id and between 1 and {MAX_ITINERARY_DAYS} days",
+                "data": None
+            }
+            return jsonify(response_data), 400
+
+        # Resolve the city names from the recommender's in-memory index, and any city
+        # that is not part of the recommender dataset from the database in one query
+        engine = get_itinerary_engine()
+        city_names = {city_id: engine.city_name(city_id) for city_id, _ in trips}
+        unresolved = sorted(city_id for city_id, name in city_names.items() if name is None)
+        if unresolved:
+            placeholders = ', '.join(['%s'] * len(unresolved))
+            db_cursor = get_cursor()
+            db_cursor.execute(f"SELECT id_kota, MIN(kota) AS kota FROM pois WHERE id_kota IN ({placeholders}) GROUP BY id_kota", tuple(unresolved))
+            for row in db_cursor.fetchall():
+                city_names[row['id_kota']] = row['kota']
+
+        # Score every city with one matrix product and plan all itineraries together
+        found = [(city_names[city_id], days) for city_id, days in trips if city_names[city_id] is not None]
+        itineraries = dict(zip(found, generate_itineraries(found)))
+
+        guides = {}
+        data = []
+        for city_id, days in trips:
+            city_name = city_names[city_id]
+            # Cities found only in the database have no POIs in the recommender dataset
+            if city_name is None or not isinstance(itineraries[(city_name, days)], list):
+                data.append({"city_id": city_id, "days": days, "message": "City not found", "itinerary": None})
+                continue
+
+            if city_name not in guides:
+                guides[city_name] = format_guides(guides_recommendation(city_name))
+
+            data.append({
+                "city_id": city_id,
+                "name": city_name,
+                "days": days,
+                "message": "OK",
+                "itinerary": itinerary_days(itineraries[(city_name, days)], days, guides[city_name])
             })
 
-        # Divide the itinerary data into an array of days
-        itinerary_per_day = []
-        for day in range(1, num_days + 1):
-            poi_per_day = []
-            for poi in itinerary_data:
-                if poi['hari'] == day:
-                    if type(poi['img']) == float:
-                        poi['img'] = 'https://dynamic-media-cdn.tripadvisor.com/media/photo-o/18/81/38/b5/saloka-memiliki-25-wahana.jpg?w=500&h=-1&s=1,110.458481,-7.2803431'
-                    poi_data = {
-                        "id": poi['attraction_id'],
-                        "name": poi['nama'],
-                        "location": poi['kota'],
-                        "image": poi['img'],
-                        "tickets": {
-                            "is_ticketing_enabled": True,
-                            "adult_price": poi['adult_price'],
-                            "child_price": poi['child_price']
-                        },
-                        "guides": guides_recommendations
-                    }
-                    poi_per_day.append(poi_data)
-            day_data = {
-                "day": day,
-                "poi": poi_per_day
+        # Return the response as JSON
+        return jsonify({
+            "status": 200,
+            "message": "OK",
+            "data": data
+        })
+
+    except Exception as e:
+        # Server error
+        response_data = {
+            "status": 500,
+            "message": f"Reason: {str(e)}",
+            "data": None
+        }
+        return jsonify(response_data), 500
+
+# Maximum number of cities in a multi-city trip
+MAX_TRIP_CITIES = 20
+
+@app.route('/trip', methods=['POST'])
+@jwt_required
+def get_trip():
+    from ml.itinerary.itinerary import generate_trip, get_engine as get_itinerary_engine
+    from ml.guides.guides import guides_recommendation
+
+    try:
+        # Body: {"cities": [<city_id>, ...], "days": <total days>, "keep_order": false}
+        # Without keep_order the cities are reordered (starting from the first one) to minimise travel
+        request_data = request.get_json(silent=True)
+        if not isinstance(request_data, dict):
+            request_data = {}
+        city_ids = request_data.get('cities')
+        if isinstance(city_ids, list) and all(is_json_int(city_id) for city_id in city_ids):
+            city_ids = list(dict.fromkeys(city_ids))
+        else:
+            city_ids = []
+        total_days = request_data.get('days', len(city_ids))
+        if not is_json_int(total_days):
+            total_days = 0
+        # keep_order is a JSON boolean; "true" / "false" strings are accepted too
+        keep_order = request_data.get('keep_order', False)
+        if isinstance(keep_order, str):
+            keep_order = {'true': True, 'false': False}.get(keep_order.lower())
+        elif not isinstance(keep_order, bool):
+            keep_order = None
+
+        if not city_ids or len(city_ids) > MAX_TRIP_CITIES or not len(city_ids) <= total_days <= MAX_ITINERARY_DAYS or keep_order is None:
+            response_data = {
+                "status": 400,
+                "message": f"Provide a JSON object with a list of 1 to {MAX_TRIP_CITIES} integer city ids, integer days (at least one per city, at most {MAX_ITINERARY_DAYS} in total) and keep_order as a boolean",
+                "data": None
             }
-            itinerary_per_day.append(day_data)
+            return jsonify(response_data), 400
+
+        engine = get_itinerary_engine()
+        unknown = [city_id for city_id in city_ids if engine.city_name(city_id) is None]
+        if unknown:
+            response_data = {
+                "status": 404,
+                "message": f"City not found: {', '.join(map(str, unknown))}",
+                "data": None
+            }
+            return jsonify(response_data), 404
+
+        trip = generate_trip(city_ids, total_days, keep_order)
+
+        cities = []
+        for leg in trip:
+            guides_recommendations = format_guides(guides_recommendation(leg['kota']))
+            cities.append({
+                "city_id": leg['id_kota'],
+                "name": leg['kota'],
+                "start_day": leg['hari_mulai'],
+                "days": leg['durasi'],
+                "distance_from_previous_km": round(leg['jarak'], 1),
+                "itinerary": itinerary_days(leg['itinerary'], leg['durasi'], guides_recommendations, leg['hari_mulai'])
+            })
 
         # Return the response as JSON
         return jsonify({
             "status": 200,
             "message": "OK",
-            "data": itinerary_per_day
+            "data": {
+                "days": total_days,
+                "distance_km": round(sum(leg['jarak'] for leg in trip), 1),
+                "cities": cities
+            }
+        })
+
+    except Exception as e:
+        # Server error
+        response_data = {
+            "status": 500,
+            "message": f"Reason: {str(e)}",
+            "data": None
+        }
+        return jsonify(response_data), 500
+
+@app.route('/city/<int:city_id>/similar', methods=['GET'])
+@jwt_required
+def get_similar_cities(city_id):
+    from ml.itinerary.itinerary import SIMILAR_CITIES, get_engine as get_itinerary_engine
+
+    try:
+        # Similar cities are precomputed from the itinerary model's city embeddings,
+        # so this is served from memory without a database query or a model call
+        engine = get_itinerary_engine()
+        if engine.city_summary(city_id) is None:
+            response_data = {
+                "status": 404,
+                "message": "City not found",
+                "data": None
+            }
+            return jsonify(response_data), 404
+
+        try:
+            size = int(request.args.get('size', SIMILAR_CITIES))
+        except ValueError:
+            size = 0
+
+        if not 1 <= size <= SIMILAR_CITIES:
+            response_data = {
+                "status": 400,
+                "message": f"size must be between 1 and {SIMILAR_CITIES}",
+                "data": None
+            }
+            return jsonify(response_data), 400
+
+        cities = []
+        for similar_id, score in engine.similar_cities(city_id, size):
+            city = engine.city_summary(similar_id)
+            cities.append({
+                "id": city['id_kota'],
+                "name": city['kota'],
+                "location": city['provinsi'],
+                "image": city['img'],
+                "similarity": round(score, 4)
+            })
+
+        # Return the response as JSON
+        return jsonify({
+            "status": 200,
+            "message": "OK",
+            "data": cities
         })
 
     except Exception as e:
@@ -916,9 +1365,9 @@ def get_city(city_id):
         city_query = "SELECT id_kota AS id, kota AS name, provinsi AS location, CONCAT('The ', kota, ' city is located at ', provinsi, '. Visit this city for your next holiday. #WisataNusantara') AS description, img AS image FROM pois WHERE id_kota = %s"
 
         # Execute the SQL query to fetch the city details
+        db_cursor = get_cursor()
         db_cursor.execute(city_query, (city_id,))
         city = db_cursor.fetchone()
-        db_cursor.fetchall()
 
         if city is None:
             # City not found
@@ -971,9 +1420,9 @@ def guide_detail(guide_id):
         else:
             guide_id = "PMD" + str(guide_id)
         # Query the database to get the guide information based on the guide_id
+        db_cursor = get_cursor()
         db_cursor.execute("SELECT * FROM guides WHERE Pemandu_ID = %s", (guide_id,))
         guide = db_cursor.fetchone()
-        db_cursor.fetchall()
 
         if not guide:
             # Guide not found
@@ -1069,8 +1518,8 @@ def guide_detail(guide_id):
 def create_order():
     try:
 
-        # Inisialisasi variabel order_id
-        order_id = None
+        # Order and ticket ids are generated in-process (see ids.py)
+        order_id = next_id()
 
         # Get the request body
         request_data = request.get_json()
@@ -1092,61 +1541,53 @@ def create_order():
             is_ticket_order = True
         else:
             is_ticket_order = False
+        db_cursor = get_cursor(write=True)
+
+        # Retrieve all POIs of the order in one query, keyed by id
+        poi_rows = {}
+        poi_ids = sorted({str(ticket['poi_id']) for ticket in ticket_data})
+        if poi_ids:
+            placeholders = ', '.join(['%s'] * len(poi_ids))
+            db_cursor.execute(f"SELECT attraction_id as id, nama as name, kota as location, adult_price, child_price FROM pois WHERE attraction_id IN ({placeholders})", tuple(poi_ids))
+            poi_rows = {str(row['id']): row for row in db_cursor.fetchall()}
+
+        missing = [poi_id for poi_id in poi_ids if poi_id not in poi_rows]
+        if missing:
+            # POI not found, nothing has been written yet
+            response_data = {
+                "status": 404,
+                "message": f"POI not found: {', '.join(missing)}",
+                "data": None
+            }
+            return jsonify(response_data), 404
+
         price = 0
         for ticket in ticket_data:
-            poi_id = ticket['poi_id']
-            num_adult = ticket['num_adult']
-            num_child = ticket['num_child']
-            
-            # Retrieve POI information from the database based on poi_id
-            poi_query = """
-                SELECT attraction_id as id, nama as name, kota as location, adult_price, child_price FROM pois WHERE attraction_id = %s
-            """
-            
-            poi_params = (poi_id,)
-            db_cursor.execute(poi_query, poi_params)
-            poi_row = db_cursor.fetchone()
-            db_cursor.fetchall()
+            poi_row = poi_rows[str(ticket['poi_id'])]
 
             # Calculate the price for the ticket
-            adult_price = poi_row['adult_price']
-            child_price = poi_row['child_price']
-            price += (adult_price * num_adult) + (child_price * num_child)
+            price += (poi_row['adult_price'] * ticket['num_adult']) + (poi_row['child_price'] * ticket['num_child'])
         created_at = datetime.datetime.now()
-        
-        # Perform order creation logic here
-        # Simpan data transaksi ke database
-        # Ganti bagian ini dengan operasi database yang sesuai untuk menyimpan data ke tabel 'transactions'
-        
 
+        # The transaction and its tickets are written in one database transaction, committed
+        # once the whole order has been processed
         db_cursor.execute(query, (order_id, is_guide_order, is_ticket_order, price, created_at))
-        db_connection.commit()            
 
-        
         # Process ticket data
         tickets = []
+        ticket_rows = []
         for ticket in ticket_data:
-        # Generate a random order ID
-            order_id = random.randint(1, 1000)
+            ticket_id = next_id()
             poi_id = ticket['poi_id']
             num_adult = ticket['num_adult']
             num_child = ticket['num_child']
-            
-            # Retrieve POI information from the database based on poi_id
-            poi_query = """
-                SELECT attraction_id as id, nama as name, kota as location, adult_price, child_price FROM pois WHERE attraction_id = %s
-            """
-            
-            poi_params = (poi_id,)
-            db_cursor.execute(poi_query, poi_params)
-            poi_row = db_cursor.fetchone()
+            poi_row = poi_rows[str(poi_id)]
 
-            
             # Perform ticket processing logic here
             
             # Generate ticket details
             ticket_details = {
-                "id": order_id,
+                "id": ticket_id,
                 "poi": {
                     "id": poi_id,
                     "name": poi_row['name'],
@@ -1177,15 +1618,15 @@ def create_order():
             # Add ticket details to the tickets list
             tickets.append(ticket_details)
 
-            # Insert ticket data into the 'tickets' table
+            ticket_rows.append((ticket_id, 1, poi_id, created_at))
+
+        # Insert all tickets into the 'tickets' table
+        if ticket_rows:
             ticket_query = """
                 INSERT INTO tickets (id, is_active, poi_id, created_at)
                 VALUES (%s, %s, %s, %s)
             """
-
-            ticket_params = (order_id, 1, poi_id, created_at)
-            db_cursor.execute(ticket_query, ticket_params)
-            db_connection.commit()
+            db_cursor.executemany(ticket_query, ticket_rows)
 
         # Process guide data
         guide = None
@@ -1197,7 +1638,6 @@ def create_order():
                 guide_id = "PMD" + str(guide_id)
             db_cursor.execute("SELECT * FROM guides WHERE Pemandu_ID = %s", (guide_id,))
             guide = db_cursor.fetchone()
-            db_cursor.fetchall()
             # Apparently, the mobile app can't handle generated images, 
             # so we'll use a list of images instead
             guides_image_male = [
@@ -1231,13 +1671,15 @@ def create_order():
                 "start_date": datetime.datetime.now().strftime("%Y-%m-%d"),
                 "end_date": (datetime.datetime.now() + datetime.timedelta(days=30)).strftime("%Y-%m-%d")
             }
+
+        get_db(write=True).commit()
             
         # Generate response data
         response_data = {
             "status": 200,
             "message": "OK",
             "data": {
-                "id": order_id,  # Replace with the actual order ID
+                "id": order_id,
                 "ticket": tickets,  # Replace with the actual ticket data
                 "guide": guide,  # Replace with the actual guide data
                 "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") # Replace with the actual creation timestamp
@@ -1247,6 +1689,9 @@ def create_order():
         # Return the response as JSON
         return jsonify(response_data), response_data['status']
     except Exception as e:
+        # Nothing of a failed order is kept
+        rollback_db()
+
         # Server error
         response_data = {
             "status": 500,
@@ -1278,6 +1723,7 @@ def list_transactions():
             """
 
         # Execute the SQL query
+        db_cursor = get_cursor()
         db_cursor.execute(query)
 
         # Fetch the results
@@ -1318,58 +1764,37 @@ def list_tickets():
     try:
         filter_type = request.args.get('filter', 'active')  # Get the filter parameter, default to 'active' if not provided
 
-        # Construct the SQL query based on the filter type
+        # Construct the SQL query based on the filter type. The POI of every ticket is
+        # joined in the same query (one query regardless of the number of tickets); tickets
+        # whose POI no longer exists get null POI fields
+        query = """
+            SELECT tickets.id, tickets.is_active, tickets.created_at,
+                pois.attraction_id AS poi_id, pois.nama AS poi_name, pois.kota AS poi_location
+            FROM tickets
+            LEFT JOIN pois ON pois.attraction_id = tickets.poi_id
+        """
         if filter_type == 'active':
-            query = """
-                SELECT * FROM tickets
-                WHERE is_active = true
-            """
+            query += "WHERE tickets.is_active = true"
         elif filter_type == 'expired':
-            query = """
-                SELECT * FROM tickets
-                WHERE is_active = false
-            """
-        else:
-            query = """
-                SELECT * FROM tickets
-            """
+            query += "WHERE tickets.is_active = false"
 
         # Execute the SQL query
+        db_cursor = get_cursor()
         db_cursor.execute(query)
 
         # Fetch the results
         results = db_cursor.fetchall()
 
-            
         # Process the results
         tickets = []
         for row in results:
-            poi_id = row['poi_id']
-            # Retrieve POI information from the database based on poi_id
-            poi_query = """
-                SELECT attraction_id as id, nama as name, kota as location FROM pois WHERE attraction_id = %s
-            """
-            
-            poi_params = (poi_id,)
-            db_cursor.execute(poi_query, poi_params)
-            poi_row = db_cursor.fetchone()
-
-            # Check if poi_row is None
-            if poi_row is None:
-                # Handle case when no matching POI is found
-                poi_row = {
-                    "id": None,
-                    "name": None,
-                    "location": None
-                }
-
             ticket = {
                 "id": row['id'],
                 "is_active": row['is_active'] == 1,
                 "poi": {
-                    "id": poi_row['id'],
-                    "name": poi_row['name'],
-                    "location": poi_row["location"]
+                    "id": row['poi_id'],
+                    "name": row['poi_name'],
+                    "location": row['poi_location']
                 },
                 "created_at": row['created_at'].strftime("%Y-%m-%d %H:%M:%S")
             }
@@ -1401,6 +1826,7 @@ def get_ticket(ticket_id):
             SELECT * FROM tickets WHERE id = %s
         """
         params = (ticket_id,)
+        db_cursor = get_cursor()
         db_cursor.execute(query, params)
 
         # Fetch the result
@@ -1485,6 +1911,7 @@ def get_transaction(trx_id):
             SELECT * FROM transactions WHERE id = %s
         """
         transaction_params = (trx_id,)
+        db_cursor = get_cursor()
         db_cursor.execute(transaction_query, transaction_params)
         transaction_row = db_cursor.fetchone()
 
@@ -1590,6 +2017,34 @@ def get_transaction(trx_id):
         }
         return jsonify(response_data), 500
 
+# Cache, coalescing and pool internals are only for operators: /internal/stats requires the
+# X-Stats-Token header to match STATS_TOKEN, and does not exist when STATS_TOKEN is unset
+STATS_TOKEN = os.getenv('STATS_TOKEN')
+
+@app.route('/internal/stats', methods=['GET'])
+def internal_stats():
+    from ml.cache import cache_stats, flight_stats
+
+    token = request.headers.get('X-Stats-Token', '')
+    if not STATS_TOKEN or not hmac.compare_digest(token.encode('utf-8'), STATS_TOKEN.encode('utf-8')):
+        response_data = {
+            "status": 404,
+            "message": "Not found",
+            "data": None
+        }
+        return jsonify(response_data), 404
+
+    response_data = {
+        "status": 200,
+        "message": "OK",
+        "data": {
+            "caches": cache_stats(),
+            "coalescing": flight_stats(),
+            "db_pools": pool_stats()
+        }
+    }
+    return jsonify(response_data), 200
+
 @app.errorhandler(400)
 def handle_client_error(e):
     # Client error
@@ -0,0 +1,58 @@
+# Compares the guide scoring modes (tfidf, model, hybrid) on the real local_guide.csv:
+# per-request latency of the live path, time to rank the full per-Tempat table, and
+# overlap@k of each mode's top-k against the others.
+#
+# Run from the repository root:
+#
+#     python benchmarks/guides_scoring.py [--k 5]
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.guides.guides import SCORING_MODES, GuideEngine
+from ml.ranking import top_k as rank_top_k
+
+def timed(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def top_k(engine, seeds, mode, k):
+    scores = engine.score(seeds, mode)
+    return np.array([rank_top_k(row, k) for row in scores])
+
+def overlap_at_k(a, b):
+    k = a.shape[1]
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(a.tolist(), b.tolist())]))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = GuideEngine(bundle_dir=None).load()
+    tempat = list(engine.tempat_index.keys())
+    seeds = [engine.get_item_index_by_tempat(t) for t in tempat]
+    print(f"{len(engine.items)} guides, {len(tempat)} distinct Tempat, k={args.k}")
+
+    print("\nlatency")
+    rankings = {}
+    for mode in SCORING_MODES:
+        per_request, _ = timed(lambda: [engine.recommend(t, k=args.k + 1, mode=mode) for t in tempat[:50]], repeat=3)
+        table_time, rankings[mode] = timed(lambda: top_k(engine, seeds, mode, args.k))
+        print(f"  {mode:<7} live recommend {per_request / 50 * 1e6:8.1f} us/request   full table {table_time * 1000:6.2f} ms")
+
+    print(f"\noverlap@{args.k}")
+    print("         " + "".join(f"{mode:>9}" for mode in SCORING_MODES))
+    for a in SCORING_MODES:
+        print(f"  {a:<7}" + "".join(f"{overlap_at_k(rankings[a], rankings[b]):9.3f}" for b in SCORING_MODES))
+
+if __name__ == '__main__':
+    main()
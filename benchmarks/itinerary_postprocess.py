@@ -0,0 +1,71 @@
+# Compares the itinerary post-processing after the similarity step: the former pandas
+# path (full argsort, items.iloc[...].copy(), column assignment, to_dict, json.dumps ->
+# json.loads and a print of the payload) against the struct-of-arrays path in
+# ItineraryEngine.recommend (argpartition top-k, plain records built from NumPy columns).
+#
+# Run from the repository root:
+#
+#     python benchmarks/itinerary_postprocess.py [--days 3] [--cities 50]
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.geo import distances_from
+from ml.routing import day_allocation, plan_days
+from ml.itinerary.itinerary import MAX_STOPS_PER_DAY, NUM_CANDIDATES, ItineraryEngine
+
+def legacy_recommend(engine, city_name, num_days, k=NUM_CANDIDATES):
+    indeks_item = engine.get_item_index_by_kota(city_name)
+    similarity_scores = engine.item_embeddings @ engine.item_embeddings[indeks_item]
+    indeks_terurut = np.argsort(-similarity_scores, kind='stable')[:k]
+
+    alokasi_hari = np.minimum(day_allocation(len(indeks_terurut), num_days), MAX_STOPS_PER_DAY)
+    kandidat = indeks_terurut[:alokasi_hari.sum()]
+    jarak_kota = distances_from(engine.latitudes[indeks_item], engine.longitudes[indeks_item], engine.latitudes[kandidat], engine.longitudes[kandidat])
+    urutan, hari = plan_days(engine.distances_between(kandidat), jarak_kota, alokasi_hari)
+
+    item_terrekomendasikan = engine.items.iloc[kandidat[urutan]].copy()
+    item_terrekomendasikan['hari'] = hari
+    item_terrekomendasikan['jarak'] = jarak_kota[urutan]
+
+    json_output = json.dumps(item_terrekomendasikan.to_dict(orient='records'))
+    print(json_output)
+    return json.loads(json_output)
+
+def timed(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--cities', type=int, default=50)
+    args = parser.parse_args()
+
+    engine = ItineraryEngine().load()
+    cities = list(engine.city_index.keys())[:args.cities]
+
+    # print() ke stdout yang sesungguhnya membuat angka bergantung pada terminal, jadi dibuang
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy_time, legacy = timed(lambda: [legacy_recommend(engine, city, args.days) for city in cities])
+    current_time, current = timed(lambda: [engine.recommend(city, args.days) for city in cities])
+
+    same = json.dumps(legacy) == json.dumps(current)
+    print(f"{len(cities)} cities, {args.days} days, {len(engine.items)} items")
+    print(f"  pandas + json round trip  {legacy_time / len(cities) * 1000:7.3f} ms/request")
+    print(f"  struct-of-arrays records  {current_time / len(cities) * 1000:7.3f} ms/request")
+    print(f"  speedup {legacy_time / current_time:.1f}x, identical output: {same}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Peak memory and time of the TF-IDF feature pipeline, dense (.toarray() + concatenate,
+# the former path) versus sparse (CSR hstack + sparse-dense product into the first Dense
+# layer), and of the full forward pass of each served model, on the real CSVs replicated
+# 1x, 10x and 100x.
+#
+# Each copy gets its own place names (every word suffixed with the copy number), so the
+# vocabulary grows with the catalog the way it would with new cities, and the dense
+# matrix grows quadratically. The models have the layer widths of the trained .h5 files
+# with random weights, since the trained models only accept the current vocabulary. Both
+# end in Dense(vocabulary), so the item embeddings they produce are a dense rows x
+# vocabulary float32 matrix whatever the input format: that output is reported for every
+# scale, and the full forward pass only runs when it fits in --output-limit-gb.
+#
+# Run from the repository root:
+#
+#     python benchmarks/sparse_features.py [--scales 1 10 100] [--dense-limit-gb 2] [--output-limit-gb 2]
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.retrieval import normalize_rows
+from ml.runtime import DenseModel, load_model
+
+MODEL_PATHS = {
+    'itinerary (kota + provinsi)': 'ml/itinerary/recommendation_model.h5',
+    'guides (Tempat)': 'ml/guides/model_local_guide.h5'
+}
+
+def replicate(values, copies):
+    values = pd.Series(values).fillna('').astype(str)
+    return pd.concat([
+        values if copy == 0 else values.map(lambda text: ' '.join(f'{word}{copy}' for word in text.split()))
+        for copy in range(copies)
+    ], ignore_index=True)
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+def dense_features(columns):
+    matrices = [TfidfVectorizer().fit_transform(column).toarray() for column in columns]
+    return normalize_rows(np.concatenate(matrices, axis=1))
+
+def sparse_features(columns):
+    matrices = [TfidfVectorizer().fit_transform(column) for column in columns]
+    return normalize_rows(sparse.hstack(matrices, format='csr', dtype=np.float32))
+
+# Model with the layer widths and activations of the .h5 file, resized to the vocabulary
+def scaled_model(path, vocabulary, rng):
+    layers = load_model(path).layers
+    widths = [vocabulary] + [kernel.shape[1] for kernel, _, _ in layers[:-1]] + [vocabulary]
+    return DenseModel([
+        (rng.standard_normal((n_in, n_out), dtype=np.float32) / np.sqrt(n_in), np.zeros(n_out, dtype=np.float32), activation)
+        for (n_in, n_out), (_, _, activation) in zip(zip(widths[:-1], widths[1:]), layers)
+    ])
+
+def first_layer(model, features):
+    kernel, bias, _ = model.layers[0]
+    return np.asarray(features @ kernel) + bias
+
+def vocabulary_size(columns):
+    return sum(len(TfidfVectorizer().fit(column).vocabulary_) for column in columns)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--dense-limit-gb', type=float, default=2.0)
+    parser.add_argument('--output-limit-gb', type=float, default=2.0)
+    args = parser.parse_args()
+
+    itinerary = pd.read_csv('ml/itinerary/wisataindonesia.csv')
+    guides = pd.read_csv('ml/guides/local_guide.csv')
+    datasets = {
+        'itinerary (kota + provinsi)': [itinerary['kota'], itinerary['provinsi']],
+        'guides (Tempat)': [guides['Tempat']]
+    }
+
+    rng = np.random.default_rng(0)
+    for label, base_columns in datasets.items():
+        print(label)
+        for scale in args.scales:
+            columns = [replicate(column, scale) for column in base_columns]
+            rows = len(columns[0])
+            vocabulary = vocabulary_size(columns)
+            model = scaled_model(MODEL_PATHS[label], vocabulary, rng)
+            dense_bytes = rows * vocabulary * 8
+            output_bytes = rows * vocabulary * 4
+
+            sparse_time, sparse_peak, sparse_out = measure(lambda: first_layer(model, sparse_features(columns)))
+            print(f"  {scale:>4}x  {rows:>7} rows x {vocabulary:>6} terms")
+            line = f"        features + first layer   sparse {sparse_peak / 2**20:9.1f} MiB {sparse_time:7.2f}s"
+            if dense_bytes <= args.dense_limit_gb * 2**30:
+                dense_time, dense_peak, dense_out = measure(lambda: first_layer(model, dense_features(columns)))
+                error = float(np.max(np.abs(dense_out - sparse_out)))
+                line += f"   dense {dense_peak / 2**20:9.1f} MiB {dense_time:7.2f}s   max abs diff {error:.1e}"
+            else:
+                line += f"   dense skipped (dense TF-IDF alone would be {dense_bytes / 2**30:.1f} GiB)"
+            print(line)
+
+            line = f"        full forward pass        output {output_bytes / 2**20:9.1f} MiB (rows x vocabulary float32)"
+            if output_bytes <= args.output_limit_gb * 2**30:
+                full_time, full_peak, _ = measure(lambda: model.predict(sparse_features(columns)))
+                line += f"   sparse input peak {full_peak / 2**20:9.1f} MiB {full_time:7.2f}s"
+            else:
+                line += "   skipped"
+            print(line)
+
+if __name__ == '__main__':
+    main()
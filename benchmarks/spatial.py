@@ -0,0 +1,85 @@
+# Radius and k-nearest queries with the in-memory grid index (ml/spatial.py) against a
+# brute-force haversine scan over every point, on the real POI coordinates and on
+# synthetic catalogs of uniformly random points over Indonesia's bounding box.
+#
+# Run from the repository root:
+#
+#     python benchmarks/spatial.py [--sizes 10000 100000] [--queries 200]
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.geo import distances_from
+from ml.spatial import GridIndex
+from ml.itinerary.itinerary import ItineraryEngine
+
+# Roughly Sabang to Merauke, Miangas to Rote
+LAT_RANGE = (-11.0, 6.0)
+LON_RANGE = (95.0, 141.0)
+RADII_KM = [1, 10, 50]
+NEIGHBOURS = [1, 10, 50]
+
+def brute_within(latitudes, longitudes, lat, lon, radius_km):
+    distances = distances_from(lat, lon, latitudes, longitudes)
+    rows = np.flatnonzero(distances <= radius_km)
+    order = np.argsort(distances[rows], kind='stable')
+    return rows[order], distances[rows][order]
+
+def brute_nearest(latitudes, longitudes, lat, lon, k):
+    distances = distances_from(lat, lon, latitudes, longitudes)
+    distances = np.where(np.isnan(distances), np.inf, distances)
+    order = np.argsort(distances, kind='stable')[:k]
+    return order, distances[order]
+
+def timed(func, queries):
+    start = time.perf_counter()
+    results = [func(lat, lon) for lat, lon in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+def compare(label, latitudes, longitudes, queries):
+    start = time.perf_counter()
+    index = GridIndex(latitudes, longitudes)
+    build_time = time.perf_counter() - start
+    print(f"{label}: {len(index)} points, {len(index.cells)} cells, built in {build_time * 1000:.1f} ms")
+
+    cases = [(f"within {radius:>3} km", lambda lat, lon, radius=radius: brute_within(latitudes, longitudes, lat, lon, radius),
+              lambda lat, lon, radius=radius: index.within(lat, lon, radius)) for radius in RADII_KM]
+    cases += [(f"nearest k={k:<4}", lambda lat, lon, k=k: brute_nearest(latitudes, longitudes, lat, lon, k),
+               lambda lat, lon, k=k: index.nearest(lat, lon, k)) for k in NEIGHBOURS]
+
+    for name, brute, grid in cases:
+        brute_time, expected = timed(brute, queries)
+        grid_time, actual = timed(grid, queries)
+        same = all(np.array_equal(e[0], a[0]) and np.allclose(e[1], a[1]) for e, a in zip(expected, actual))
+        found = np.mean([len(a[0]) for a in actual])
+        print(f"  {name}  brute force {brute_time * 1e6:9.1f} us   grid {grid_time * 1e6:8.1f} us"
+              f"   {brute_time / grid_time:6.1f}x   {found:7.1f} results   identical: {same}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    # Queries near existing POIs, like a user standing at an attraction
+    engine = ItineraryEngine().load()
+    valid = np.flatnonzero(np.isfinite(engine.latitudes) & np.isfinite(engine.longitudes))
+    picked = rng.choice(valid, args.queries)
+    queries = list(zip(engine.latitudes[picked] + rng.normal(0, 0.05, args.queries),
+                       engine.longitudes[picked] + rng.normal(0, 0.05, args.queries)))
+    compare('POIs', engine.latitudes, engine.longitudes, queries)
+
+    for size in args.sizes:
+        latitudes = rng.uniform(*LAT_RANGE, size)
+        longitudes = rng.uniform(*LON_RANGE, size)
+        queries = list(zip(rng.uniform(*LAT_RANGE, args.queries), rng.uniform(*LON_RANGE, args.queries)))
+        compare(f'synthetic {size}', latitudes, longitudes, queries)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Measures cold-start cost of the Flask app: time to import app.py and the resulting
+# peak RSS, with and without loading the recommenders. Each mode runs in a fresh
+# interpreter so nothing is shared between measurements.
+#
+# Run from the repository root:
+#
+#     python benchmarks/startup.py [--runs 5]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+if {warmup}:
+    app.load_recommenders()
+ready = time.perf_counter()
+print(json.dumps({{
+    'import_s': imported - start,
+    'ready_s': ready - start,
+    'maxrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': sorted(m for m in ('pandas', 'sklearn', 'scipy', 'tensorflow', 'keras') if m in sys.modules)
+}}))
+"""
+
+def run_probe(warmup):
+    env = dict(os.environ, WARMUP_ON_START='')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(warmup=warmup)],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for label, warmup in (('lazy (import only)', False), ('warm (import + load_recommenders)', True)):
+        results = [run_probe(warmup) for _ in range(args.runs)]
+        print(label)
+        print(f"  import:  {statistics.median(r['import_s'] for r in results) * 1000:8.1f} ms (median of {args.runs})")
+        print(f"  ready:   {statistics.median(r['ready_s'] for r in results) * 1000:8.1f} ms")
+        print(f"  max RSS: {statistics.median(r['maxrss_mb'] for r in results):8.1f} MB")
+        print(f"  heavy modules loaded: {', '.join(results[-1]['heavy_modules']) or 'none'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# Thread-safe MySQL connection pool.
+#
+# A mysql.connector connection must not be shared between threads, so every request
+# checks out its own connection (see get_db in app.py) and returns it on teardown.
+# Connections are opened lazily up to the pool size; when all of them are in use, callers
+# wait in arrival order up to the checkout timeout and then get PoolTimeout instead of
+# queueing forever.
+#
+# Connections that sat idle longer than the ping interval are pinged before being handed
+# out, and connections returned by a failed request are pinged before going back to the
+# pool; a connection that was dropped by the server (wait_timeout, failover, restart) is
+# closed and replaced with a fresh one. Checkout and saturation counters are reported by
+# pool_stats().
+import os
+import threading
+import time
+from collections import deque
+import mysql.connector
+
+# All pools created, reported by pool_stats()
+_registry = {}
+_registry_lock = threading.Lock()
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    def __init__(self, name, connect, size=8, timeout=10, ping_interval=30, clock=time.monotonic):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._connect = connect
+        self._clock = clock
+        # Idle connections as (connection, returned at), most recently returned last
+        self._idle = []
+        self._opened = 0
+        # Callers waiting for a connection, served first come first served
+        self._waiters = deque()
+        self._available = threading.Condition(threading.Lock())
+
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.dropped = 0
+        self.max_in_use = 0
+
+        with _registry_lock:
+            _registry[name] = self
+
+    def acquire(self):
+        start = self._clock()
+        deadline = start + self.timeout
+        with self._available:
+            # A thread returning a connection must not take it again ahead of threads already waiting
+            waited = bool(self._waiters) or not self._has_capacity()
+            if waited:
+                self.waits += 1
+                waiter = object()
+                self._waiters.append(waiter)
+                try:
+                    while self._waiters[0] is not waiter or not self._has_capacity():
+                        remaining = deadline - self._clock()
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            raise PoolTimeout(f"{self.name}: no connection available after {self.timeout}s ({self.size} in use)")
+                        self._available.wait(remaining)
+                finally:
+                    self._waiters.remove(waiter)
+                    self._available.notify_all()
+
+            # The slot is reserved under the lock; connecting and pinging happen outside it
+            connection, returned_at = self._idle.pop() if self._idle else (None, None)
+            if connection is None:
+                self._opened += 1
+            self.checkouts += 1
+            if waited:
+                self.wait_time += self._clock() - start
+            self.max_in_use = max(self.max_in_use, self._opened - len(self._idle))
+
+        try:
+            if connection is None:
+                return self._connect()
+            if self._clock() - returned_at >= self.ping_interval and not self._alive(connection):
+                self._close(connection)
+                connection = self._connect()
+                with self._available:
+                    self.reconnects += 1
+            return connection
+        except BaseException:
+            self._forget()
+            raise
+
+    def _has_capacity(self):
+        return bool(self._idle) or self._opened < self.size
+
+    def _alive(self, connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    # Gives up the slot of a connection that could not be opened or was discarded
+    def _forget(self):
+        with self._available:
+            self._opened -= 1
+            self._available.notify_all()
+
+    # Uncommitted work is rolled back so the next request starts from a clean transaction;
+    # with discard=True (or if the rollback fails) the connection is closed instead. With
+    # check=True (the request failed, possibly because the connection was lost) the
+    # connection is pinged first and closed if the server no longer answers.
+    def release(self, connection, discard=False, check=False):
+        if not discard and check and not self._alive(connection):
+            discard = True
+            with self._available:
+                self.dropped += 1
+
+        if not discard:
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._close(connection)
+            self._forget()
+            return
+
+        with self._available:
+            self._idle.append((connection, self._clock()))
+            self._available.notify_all()
+
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for connection, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._available:
+            in_use = self._opened - len(self._idle)
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "waiting": len(self._waiters),
+                "utilization": in_use / self.size,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "avg_wait_ms": self.wait_time / self.waits * 1000 if self.waits else None,
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "dropped": self.dropped
+            }
+
+# Settings with another prefix (e.g. DB_REPLICA_HOST) fall back to the DB_ ones, so a
+# replica only needs the settings that differ from the primary
+def _setting(prefix, key, default=None):
+    return os.getenv(f'{prefix}_{key}', os.getenv(f'DB_{key}', default))
+
+# Connection settings come from DB_HOST, DB_USER, DB_PASSWORD, DB_NAME and
+# DB_CONNECT_TIMEOUT (seconds, so an unreachable host fails fast instead of waiting for the
+# TCP timeout); the pool from DB_POOL_SIZE, DB_POOL_TIMEOUT (seconds to wait for a free
+# connection) and DB_POOL_PING_INTERVAL (seconds idle before a connection is checked)
+def connection_settings(prefix='DB'):
+    return {
+        "host": _setting(prefix, 'HOST'),
+        "user": _setting(prefix, 'USER'),
+        "password": _setting(prefix, 'PASSWORD'),
+        "database": _setting(prefix, 'NAME'),
+        "connection_timeout": int(_setting(prefix, 'CONNECT_TIMEOUT', 5))
+    }
+
+def pool_from_env(name, prefix='DB'):
+    settings = connection_settings(prefix)
+    return ConnectionPool(
+        name,
+        lambda: mysql.connector.connect(**settings),
+        size=int(_setting(prefix, 'POOL_SIZE', 8)),
+        timeout=float(_setting(prefix, 'POOL_TIMEOUT', 10)),
+        ping_interval=float(_setting(prefix, 'POOL_PING_INTERVAL', 30))
+    )
+
+def pool_stats():
+    with _registry_lock:
+        pools = list(_registry.values())
+    return {pool.name: pool.stats() for pool in pools}
@@ -0,0 +1,178 @@
+# Snowflake-style 64-bit IDs for orders and tickets, generated in-process.
+#
+# An ID is (milliseconds since EPOCH_MS) << 22 | worker id << 12 | sequence, so IDs from
+# one worker are strictly increasing and IDs from different workers never collide as
+# long as their worker ids differ. Up to 4096 IDs per millisecond per worker; beyond
+# that, and when the clock goes backwards, the generator keeps counting from the last
+# timestamp it used instead of sleeping or repeating an ID.
+#
+# Every process leases a unique worker id on its first ID: it takes the first free MySQL
+# named lock wisnu_worker_<n> (GET_LOCK) on the primary and keeps that connection open, so
+# no two live processes issue IDs under one worker id (see WorkerLease for a lost lock).
+# WORKER_ID overrides the lease for local runs without a database; it must not be set in
+# app.yaml, since App Engine gives every instance of a version the same environment and
+# they would all share one worker id. IDs fit a signed BIGINT column.
+import os
+import threading
+import time
+import mysql.connector
+from db import connection_settings
+
+# 2023-06-01T00:00:00Z
+EPOCH_MS = 1685577600000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+LOCK_PREFIX = 'wisnu_worker_'
+
+# Takes the first free worker id lock on the connection. GET_LOCK(name, 0) returns 1 if the
+# lock was acquired and 0 if another session holds it, without waiting.
+def lease_worker_id(connection):
+    cursor = connection.cursor()
+    try:
+        for worker_id in range(MAX_WORKER_ID + 1):
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (f'{LOCK_PREFIX}{worker_id}',))
+            if cursor.fetchone()[0] == 1:
+                return worker_id
+    finally:
+        cursor.close()
+    raise RuntimeError(f"All {MAX_WORKER_ID + 1} worker ids are leased")
+
+# Worker id held through a named lock on a dedicated connection. The lock goes away with
+# the connection (server restart, failover, wait_timeout), and another process may then
+# take the same worker id, so the lease fails closed:
+#
+# - IDs are only issued under a worker id for check_interval seconds after a check (taken
+#   before the query) confirmed that this connection still holds the lock. After that the
+#   next ID re-checks first, one query per interval, not per ID. A failed check or a
+#   connection error means the lock is taken again, and no ID is issued until then.
+# - A newly taken lock is only used after check_interval seconds. A previous holder that
+#   lost it stops issuing IDs at most check_interval after its last successful check, which
+#   was before the lock was freed, so the two never issue IDs under one worker id at once.
+#
+# The first ID of a process therefore waits check_interval seconds.
+class WorkerLease:
+    def __init__(self, connect, check_interval=2, clock=time.monotonic, sleep=time.sleep):
+        self._connect = connect
+        self.check_interval = check_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._connection = None
+        self._worker_id = None
+        # (worker id, issue IDs until), replaced as a whole so readers never see a mix
+        self._current = None
+        self._lock = threading.Lock()
+
+    def worker_id(self):
+        current = self._current
+        if current is not None and self._clock() < current[1]:
+            return current[0]
+        with self._lock:
+            current = self._current
+            if current is None or self._clock() >= current[1]:
+                current = self._renew()
+            return current[0]
+
+    def _renew(self):
+        self._current = None
+        checked_at = self._clock()
+        if self._connection is not None and self._holds_lock():
+            self._current = (self._worker_id, checked_at + self.check_interval)
+            return self._current
+
+        self._acquire()
+        self._sleep(self.check_interval)
+        checked_at = self._clock()
+        if not self._holds_lock():
+            self.release()
+            raise RuntimeError(f"Lost worker id lock {LOCK_PREFIX}{self._worker_id} right after taking it")
+        self._current = (self._worker_id, checked_at + self.check_interval)
+        return self._current
+
+    def _holds_lock(self):
+        try:
+            cursor = self._connection.cursor()
+            cursor.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (f'{LOCK_PREFIX}{self._worker_id}',))
+            held = cursor.fetchone()[0] == 1
+            cursor.close()
+            return held
+        except Exception:
+            return False
+
+    def _acquire(self):
+        self.release()
+        connection = self._connect()
+        try:
+            self._worker_id = lease_worker_id(connection)
+        except BaseException:
+            connection.close()
+            raise
+        self._connection = connection
+
+    def release(self):
+        self._current = None
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+class IdGenerator:
+    # worker_id fixes the worker id; otherwise it comes from WORKER_ID or, normally, from
+    # a WorkerLease on the primary database
+    def __init__(self, worker_id=None, lease=None, clock=time.time):
+        if worker_id is None and lease is None:
+            if os.getenv('WORKER_ID'):
+                worker_id = int(os.getenv('WORKER_ID'))
+            else:
+                lease = WorkerLease(lambda: mysql.connector.connect(**connection_settings()))
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+        self._worker_id = worker_id
+        self._lease = lease
+        self._clock = clock
+        self._timestamp = -1
+        self._sequence = 0
+        # Held only to read and advance the (timestamp, sequence) pair
+        self._lock = threading.Lock()
+
+    @property
+    def worker_id(self):
+        return self._worker_id if self._lease is None else self._lease.worker_id()
+
+    def next_id(self):
+        worker_id = self.worker_id
+        now = int(self._clock() * 1000) - EPOCH_MS
+        with self._lock:
+            if now > self._timestamp:
+                self._timestamp = now
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                # Sequence exhausted (or clock behind): borrow the next millisecond
+                self._timestamp += 1
+                self._sequence = 0
+            return (self._timestamp << (WORKER_BITS + SEQUENCE_BITS)) | (worker_id << SEQUENCE_BITS) | self._sequence
+
+# (milliseconds since the Unix epoch, worker id, sequence) of an ID
+def parse_id(value):
+    return (
+        (value >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS,
+        (value >> SEQUENCE_BITS) & MAX_WORKER_ID,
+        value & MAX_SEQUENCE
+    )
+
+_generator = None
+_generator_lock = threading.Lock()
+
+def next_id():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = IdGenerator()
+    return _generator.next_id()
@@ -0,0 +1,225 @@
+# Bundle artefak rekomendasi yang dibangun offline.
+#
+# Build (butuh scikit-learn dan h5py), dijalankan dari root repository:
+#
+#     python -m ml.bundle
+#
+# Worker gunicorn membuka array di dalam bundle dengan np.load(mmap_mode='r') sehingga
+# halaman memori dibagi lewat page cache antar proses, bukan disalin per worker.
+# Matriks sparse disimpan sebagai array CSR (data, indices, indptr) dan dibuka dengan cara yang sama,
+# DataFrame sebagai snapshot kolom bertipe (lihat ml/snapshot.py).
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from ml.snapshot import load_columns, save_columns
+
+# Naikkan setiap kali layout bundle berubah; bundle dengan format lain diabaikan
+BUNDLE_FORMAT = 9
+BUNDLE_DIR = os.getenv('WISNU_BUNDLE_DIR', 'ml/artifacts/bundle')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def source_fingerprint(paths):
+    return {path: file_sha256(path) for path in sorted(paths)}
+
+# Versi pendek dari sekumpulan file sumber; dipakai sebagai versi bundle dan sebagai bagian key cache
+def fingerprint_version(fingerprint):
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+# Kosakata dan bobot IDF dari TfidfVectorizer dalam bentuk yang bisa disimpan sebagai JSON
+def tfidf_vocabulary(vectorizer):
+    return {
+        'vocabulary': {term: int(index) for term, index in vectorizer.vocabulary_.items()},
+        'idf': vectorizer.idf_.tolist()
+    }
+
+class BundleWriter:
+    def __init__(self, out_dir=BUNDLE_DIR):
+        self.out_dir = out_dir
+        self.tmp_dir = out_dir + '.tmp'
+        self.sources = set()
+        self.arrays = {}
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+
+    def _path(self, name, ext):
+        path = os.path.join(self.tmp_dir, name + ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def add_sources(self, *paths):
+        self.sources.update(paths)
+
+    def save_array(self, name, array):
+        array = np.ascontiguousarray(array)
+        np.save(self._path(name, '.npy'), array)
+        self.arrays[name] = {'shape': list(array.shape), 'dtype': str(array.dtype)}
+
+    def save_sparse(self, name, matrix):
+        matrix = matrix.tocsr()
+        for part in ('data', 'indices', 'indptr'):
+            np.save(self._path(f'{name}/{part}', '.npy'), getattr(matrix, part))
+        self.arrays[name] = {'shape': list(matrix.shape), 'dtype': str(matrix.dtype), 'format': 'csr', 'nnz': int(matrix.nnz)}
+
+    def save_json(self, name, obj):
+        with open(self._path(name, '.json'), 'w') as file:
+            json.dump(obj, file)
+
+    def save_frame(self, name, frame):
+        save_columns(frame, self._path(name, '.npz'))
+
+    def commit(self):
+        sources = source_fingerprint(self.sources)
+        version = fingerprint_version(sources)
+        manifest = {
+            'format': BUNDLE_FORMAT,
+            'version': version,
+            'created_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'sources': sources,
+            'arrays': self.arrays
+        }
+        with open(os.path.join(self.tmp_dir, 'manifest.json'), 'w') as file:
+            json.dump(manifest, file, indent=2)
+
+        # Ganti bundle lama sekaligus supaya worker tidak pernah melihat bundle setengah jadi
+        old_dir = self.out_dir + '.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.out_dir):
+            os.rename(self.out_dir, old_dir)
+        os.rename(self.tmp_dir, self.out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return manifest
+
+class Bundle:
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+
+    def array(self, name):
+        return np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+
+    def sparse(self, name):
+        from scipy import sparse
+
+        parts = [self.array(f'{name}/{part}') for part in ('data', 'indices', 'indptr')]
+        return sparse.csr_matrix(tuple(parts), shape=tuple(self.manifest['arrays'][name]['shape']), copy=False)
+
+    def json(self, name):
+        with open(os.path.join(self.path, name + '.json')) as file:
+            return json.load(file)
+
+    def frame(self, name):
+        return load_columns(os.path.join(self.path, name + '.npz'))[0]
+
+# Mengembalikan None jika bundle tidak ada, formatnya berbeda, atau dibangun dari file sumber yang sudah berubah
+def open_bundle(sources, path=BUNDLE_DIR):
+    manifest_path = os.path.join(path, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+
+    if manifest.get('format') != BUNDLE_FORMAT:
+        print(f"Ignoring bundle at {path}: format {manifest.get('format')} != {BUNDLE_FORMAT}")
+        return None
+
+    for source, digest in source_fingerprint(sources).items():
+        if manifest['sources'].get(source) != digest:
+            print(f"Ignoring bundle at {path}: {source} changed since the bundle was built")
+            return None
+
+    return Bundle(path, manifest)
+
+# Dasar engine rekomendasi yang dimuat dari dataset dan model: dibangun sekali per proses
+# (_build), atau dibuka dari bundle (_load_bundle) jika tersedia dan masih sesuai sumbernya,
+# lalu disiapkan untuk melayani request (_prepare). load() aman dipanggil dari banyak thread;
+# setelah dimuat semua atribut hanya dibaca.
+class BundledEngine:
+    def __init__(self, data_path, model_path, bundle_dir=BUNDLE_DIR):
+        self.data_path = data_path
+        self.model_path = model_path
+        self.bundle_dir = bundle_dir
+        self.version = None
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @property
+    def sources(self):
+        return [self.data_path, self.model_path]
+
+    def load(self):
+        if self._loaded:
+            return self
+
+        with self._lock:
+            if self._loaded:
+                return self
+
+            bundle = None
+            if self.bundle_dir is not None:
+                bundle = open_bundle(self.sources, self.bundle_dir)
+
+            if bundle is not None:
+                self._load_bundle(bundle)
+            else:
+                self._build()
+
+            # Versi diturunkan dari file sumber, sama baik dibangun di proses ini maupun dari bundle
+            self.version = fingerprint_version(source_fingerprint(self.sources))
+
+            self._prepare()
+            self._loaded = True
+
+        return self
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _load_bundle(self, bundle):
+        raise NotImplementedError
+
+    def _prepare(self):
+        pass
+
+# Fungsi get_engine() untuk kelas engine: satu engine per proses, dibuat saat pertama kali
+# dibutuhkan dan dimuat sebelum dikembalikan
+def engine_getter(engine_class):
+    engine = None
+    lock = threading.Lock()
+
+    def get_engine():
+        nonlocal engine
+        if engine is None:
+            with lock:
+                if engine is None:
+                    engine = engine_class()
+        return engine.load()
+
+    return get_engine
+
+def build_bundle(out_dir=BUNDLE_DIR):
+    from ml.itinerary.itinerary import ItineraryEngine
+    from ml.guides.guides import GuideEngine
+
+    writer = BundleWriter(out_dir)
+    for engine in (ItineraryEngine(bundle_dir=None), GuideEngine(bundle_dir=None)):
+        engine.load()
+        engine.export(writer)
+    return writer.commit()
+
+if __name__ == '__main__':
+    manifest = build_bundle()
+    print(f"Bundle {manifest['version']} written to {BUNDLE_DIR}")
+    for name, info in manifest['arrays'].items():
+        print(f"  {name}: {info['dtype']} {info['shape']}")
@@ -0,0 +1,170 @@
+# Cache in-process untuk hasil rekomendasi.
+#
+# TTLCache adalah LRU berukuran tetap dengan masa berlaku per entri. Key sebaiknya
+# menyertakan versi model/bundle sehingga hasil lama otomatis tidak terpakai setelah
+# model diganti. Nilai yang disimpan dibagikan ke semua pemanggil, jadi perlakukan
+# sebagai read-only.
+#
+# SingleFlight menggabungkan pemanggilan serentak dengan key yang sama: hanya satu
+# thread yang menghitung, thread lain menunggu dan memakai hasil yang sama.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Semua cache dan SingleFlight yang dibuat, untuk dilaporkan lewat cache_stats() dan flight_stats()
+_registry = {}
+_flights = {}
+_registry_lock = threading.Lock()
+
+class TTLCache:
+    def __init__(self, name, maxsize=256, ttl=3600, clock=time.monotonic):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        with _registry_lock:
+            _registry[name] = self
+
+    # Mengembalikan (True, nilai) jika key ada dan belum kedaluwarsa, selain itu (False, None)
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # Nilai yang masih berlaku tanpa mengubah urutan LRU maupun statistik
+    def _peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                return True, entry[1]
+            return False, None
+
+    # Dengan flight, miss serentak untuk key yang sama hanya dihitung sekali
+    def get_or_compute(self, key, compute, flight=None):
+        hit, value = self.get(key)
+        if hit:
+            return value
+
+        def compute_and_store():
+            # Pemanggilan sebelumnya bisa saja baru selesai mengisi cache
+            hit, value = self._peek(key)
+            if not hit:
+                value = compute()
+                self.set(key, value)
+            return value
+
+        if flight is None:
+            return compute_and_store()
+        return flight.do(key, compute_and_store)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None
+            }
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.collapsed = 0
+
+        with _registry_lock:
+            _flights[name] = self
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "collapsed": self.collapsed
+            }
+
+# Ukuran dan TTL bisa diatur lewat environment, mis. ITINERARY_CACHE_SIZE dan ITINERARY_CACHE_TTL
+def cache_from_env(name, maxsize=256, ttl=3600):
+    prefix = name.upper()
+    return TTLCache(
+        name,
+        maxsize=int(os.getenv(f'{prefix}_CACHE_SIZE', maxsize)),
+        ttl=float(os.getenv(f'{prefix}_CACHE_TTL', ttl))
+    )
+
+def cache_stats():
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+def flight_stats():
+    with _registry_lock:
+        flights = list(_flights.values())
+    return {flight.name: flight.stats() for flight in flights}
@@ -0,0 +1,38 @@
+# Jarak haversine yang divektorisasi dengan NumPy.
+#
+# Semua fungsi menerima derajat (kolom latitude/longitude apa adanya) dan
+# mengembalikan kilometer. Input skalar dan array di-broadcast seperti biasa.
+import numpy as np
+
+R = 6371  # Jari-jari bumi dalam kilometer
+
+# Inti formula haversine dalam radian; cos(lat) dihitung sekali per titik, bukan per pasangan
+def _haversine_rad(lat1, lon1, cos_lat1, lat2, lon2, cos_lat2):
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+    return _haversine_rad(lat1, lon1, np.cos(lat1), lat2, lon2, np.cos(lat2))
+
+# Jarak dari satu titik ke banyak titik
+def distances_from(lat, lon, lats, lons):
+    return haversine(lat, lon, np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+
+# Matriks jarak (n, m) antara dua himpunan titik; tanpa himpunan kedua, jarak antar titik itu sendiri (n, n)
+def pairwise_distances(lats, lons, other_lats=None, other_lons=None):
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    if other_lats is None:
+        other_lats, other_lons = lats, lons
+    else:
+        other_lats = np.radians(np.asarray(other_lats, dtype=np.float64))
+        other_lons = np.radians(np.asarray(other_lons, dtype=np.float64))
+
+    return _haversine_rad(
+        lats[:, None], lons[:, None], np.cos(lats)[:, None],
+        other_lats[None, :], other_lons[None, :], np.cos(other_lats)[None, :]
+    )
@@ -1,64 +1,180 @@
 # import libraries
+import os
 import numpy as np
-import pandas as pd
-import tensorflow as tf
-from keras.models import load_model
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-def guides_recommendation(tempat_input):
-    # get data
-    data = pd.read_csv('ml/guides/local_guide.csv')
-
-    # create object TfidfVectorizer
-    vectorizer = TfidfVectorizer()
-
-    # Melakukan vektorisasi TF-IDF pada fitur "Tempat"
-    tfidf_matrix_tempat = vectorizer.fit_transform(data['Tempat'])
-
-    # Mengubah matriks TF-IDF menjadi array
-    tfidf_matrix = tfidf_matrix_tempat.toarray()
-
-    # loads model
-    model = load_model('ml/guides/model_local_guide.h5')
-
-    # Merekomendasikan item berdasarkan Tempat
-    def recommend_items(tempat, tfidf_matrix, model, items=data[['Pemandu_ID', 'Nama_Pemandu', 'Optional_Bahasa', 'Umur', 'Jenis_Kelamin', 'Tempat', 'Pendidikan_Terakhir', 'Pekerjaan', 'Nomor_Telepon', 'Price_per_hour', 'Time_duration_in_min', 'Avatars', 'Rating']], k=5):
-        # Mendapatkan indeks item berdasarkan input Tempat
-        def get_item_index_by_tempat(tempat, data):
-            index = data[data['Tempat'] == tempat].index
-            return index[0] if len(index) > 0 else None
-
-        indeks_item = get_item_index_by_tempat(tempat, data)
+from ml.runtime import load_model
+from ml.index import LookupIndex
+from ml.retrieval import Retriever, normalize_rows
+from ml.snapshot import read_dataset
+from ml.cache import SingleFlight, cache_from_env
+from ml.bundle import BUNDLE_DIR, BundledEngine, engine_getter, tfidf_vocabulary
+from ml.materialize import materialized_or_live
+
+DATA_PATH = 'ml/guides/local_guide.csv'
+MODEL_PATH = 'ml/guides/model_local_guide.h5'
+
+# Jumlah pemandu yang direkomendasikan per Tempat
+TOP_K = 5
+
+# Cara menilai kemiripan setiap pemandu terhadap Tempat:
+#   tfidf  - cosine TF-IDF Tempat dengan TF-IDF Tempat tujuan (tanpa model)
+#   model  - cosine TF-IDF Tempat dengan prediksi model untuk Tempat tujuan
+#   hybrid - campuran keduanya dengan bobot HYBRID_WEIGHT untuk tfidf
+# Ketiganya berupa satu perkalian matriks-vektor terhadap tfidf_matrix, hanya vektor query-nya yang berbeda.
+SCORING_MODES = ('tfidf', 'model', 'hybrid')
+SCORING_MODE = os.getenv('GUIDES_SCORING_MODE', 'model')
+HYBRID_WEIGHT = float(os.getenv('GUIDES_HYBRID_WEIGHT', 0.5))
+
+ITEM_COLUMNS = ['Pemandu_ID', 'Nama_Pemandu', 'Optional_Bahasa', 'Umur', 'Jenis_Kelamin', 'Tempat', 'Pendidikan_Terakhir', 'Pekerjaan', 'Nomor_Telepon', 'Price_per_hour', 'Time_duration_in_min', 'Avatars', 'Rating']
+
+class GuideEngine(BundledEngine):
+    # Matriks TF-IDF "Tempat" (sparse CSR) dan prediksi model untuk setiap baris dihitung sekali
+    # per proses (atau dibuka dari bundle offline, lihat BundledEngine di ml/bundle.py), keduanya
+    # sudah dinormalisasi sehingga cosine similarity cukup berupa satu perkalian sparse-dense.
+    #
+    # Karena hasilnya hanya bergantung pada Tempat, peringkat top-k untuk setiap Tempat
+    # disiapkan di muka (tabel di bundle, atau dihitung sekali saat dimuat) sehingga
+    # recommend() cukup berupa lookup dictionary.
+    def __init__(self, data_path=DATA_PATH, model_path=MODEL_PATH, bundle_dir=BUNDLE_DIR, mode=SCORING_MODE):
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode {mode}, expected one of {', '.join(SCORING_MODES)}")
+        super().__init__(data_path, model_path, bundle_dir)
+        self.mode = mode
+
+    def _prepare(self):
+        self.tempat_index = LookupIndex(self.data['Tempat'])
+        # tfidf_matrix sudah dinormalisasi saat dibangun
+        self.retriever = Retriever(self.tfidf_matrix)
+        # Tabel di bundle hanya dipakai jika dibangun dengan mode yang sama
+        if self.topk_rows is None or self.topk_mode != self.mode:
+            self.topk_mode = self.mode
+            self.topk_tempat, self.topk_rows, self.topk_scores = self._rank_all_tempat(self.mode)
+        self._build_table()
+
+    def _build(self):
+        # scikit-learn hanya dibutuhkan jika bundle tidak tersedia
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        # get data
+        data = read_dataset(self.data_path)
+
+        # create object TfidfVectorizer
+        self.vectorizer = TfidfVectorizer()
+
+        # Melakukan vektorisasi TF-IDF pada fitur "Tempat", tetap dalam bentuk sparse (CSR)
+        tfidf_matrix = self.vectorizer.fit_transform(data['Tempat'])
+
+        # loads model
+        model = load_model(self.model_path)
+
+        # Prediksi model untuk setiap baris, dipakai sebagai vektor query
+        self.tfidf_matrix = normalize_rows(tfidf_matrix)
+        self.item_embeddings = normalize_rows(model.predict(tfidf_matrix))
+
+        self.data = data
+        self.items = data[ITEM_COLUMNS]
+        self.topk_rows = None
+
+    def _load_bundle(self, bundle):
+        self.tfidf_matrix = bundle.sparse('guides/tfidf')
+        self.item_embeddings = bundle.array('guides/embeddings')
+        self.data = bundle.frame('guides/items')
+        self.items = self.data[ITEM_COLUMNS]
+        topk = bundle.json('guides/topk')
+        self.topk_mode = topk['mode']
+        self.topk_tempat = topk['tempat']
+        self.topk_rows = bundle.array('guides/topk_rows')
+        self.topk_scores = bundle.array('guides/topk_scores')
+
+    # Vektor query dense (satu baris per seed) untuk mode penilaian
+    def _queries(self, seeds, mode):
+        if mode == 'tfidf':
+            return self.tfidf_matrix[seeds].toarray()
+        if mode == 'model':
+            return self.item_embeddings[seeds]
+        return HYBRID_WEIGHT * self.tfidf_matrix[seeds].toarray() + (1 - HYBRID_WEIGHT) * self.item_embeddings[seeds]
+
+    # Skor semua baris untuk setiap seed, bentuk (len(seeds), jumlah baris)
+    def score(self, seeds, mode=None):
+        return self.retriever.scores(self._queries(seeds, mode or self.mode))
+
+    # Peringkat top-k untuk setiap Tempat yang berbeda sekaligus dengan satu perkalian matriks
+    def _rank_all_tempat(self, mode, k=TOP_K):
+        tempat = list(self.tempat_index.keys())
+        seeds = [self.tempat_index.first(t) for t in tempat]
+        rows, scores = self.retriever.search_batch(self._queries(seeds, mode), k)
+        return tempat, np.array(rows, dtype=np.int32), np.array(scores, dtype=np.float32)
+
+    # Tempat -> daftar record pemandu siap pakai, diurutkan seperti sebelumnya (Tempat menurun)
+    def _build_table(self):
+        self._topk_positions = {tempat: position for position, tempat in enumerate(self.topk_tempat)}
+        self.table = {}
+        for tempat, rows in zip(self.topk_tempat, self.topk_rows):
+            item_terrekomendasikan = self.items.iloc[rows].sort_values('Tempat', ascending=False, kind='stable')
+            self.table[tempat] = item_terrekomendasikan.to_dict('records')
+
+    def export(self, writer):
+        writer.add_sources(*self.sources)
+        writer.save_sparse('guides/tfidf', self.tfidf_matrix)
+        writer.save_array('guides/embeddings', self.item_embeddings)
+        writer.save_json('guides/vocab', {
+            'Tempat': tfidf_vocabulary(self.vectorizer)
+        })
+        writer.save_frame('guides/items', self.items)
+        writer.save_json('guides/topk', {'mode': self.topk_mode, 'tempat': self.topk_tempat})
+        writer.save_array('guides/topk_rows', self.topk_rows)
+        writer.save_array('guides/topk_scores', self.topk_scores)
+
+    # Mendapatkan indeks item berdasarkan input Tempat
+    def get_item_index_by_tempat(self, tempat):
+        return self.tempat_index.first(tempat)
+
+    def rows_by_tempat(self, tempat):
+        return self.tempat_index.rows(tempat)
+
+    # Pemandu_ID dan skor top-k untuk Tempat, sesuai urutan peringkat
+    def ranking(self, tempat):
+        self.load()
+        position = self._topk_positions.get(tempat)
+        if position is None:
+            return []
+        ids = self.items['Pemandu_ID'].iloc[self.topk_rows[position]].tolist()
+        return list(zip(ids, self.topk_scores[position].tolist()))
+
+    # Merekomendasikan item berdasarkan Tempat, mode default adalah mode engine
+    def recommend(self, tempat, k=TOP_K, mode=None):
+        self.load()
+        mode = mode or self.mode
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode {mode}, expected one of {', '.join(SCORING_MODES)}")
+
+        if k == TOP_K and mode == self.topk_mode:
+            return self.table.get(tempat, [])
+
+        indeks_item = self.get_item_index_by_tempat(tempat)
         if indeks_item is None:
             return []  # Mengembalikan list kosong jika Tempat tidak ditemukan
 
-        item_embedding = tfidf_matrix[indeks_item]
-        item_embedding = np.reshape(item_embedding, (1, -1))
-
-        similarity_scores = cosine_similarity(tfidf_matrix, item_embedding)
-        similarity_scores = similarity_scores.flatten()
-
-        indeks_terurut = np.argsort(similarity_scores)[::-1][:k]
-        item_terrekomendasikan = items.iloc[indeks_terurut].copy()  # Add .copy() here
+        indeks_terurut_pred, _ = self.retriever.search(self._queries([indeks_item], mode)[0], k)
+        item_terrekomendasikan_pred = self.items.iloc[indeks_terurut_pred]
 
         # Mengurutkan berdasarkan Tempat terbaik
-        item_terrekomendasikan = item_terrekomendasikan.sort_values('Tempat', ascending=False)
+        item_terrekomendasikan_pred = item_terrekomendasikan_pred.sort_values('Tempat', ascending=False, kind='stable')
 
-        # Prediksi menggunakan model
-        item_embedding_pred = model.predict(item_embedding)
-        similarity_scores_pred = cosine_similarity(tfidf_matrix, item_embedding_pred)
-        similarity_scores_pred = similarity_scores_pred.flatten()
+        # Convert the recommended items to a list of dictionaries
+        return item_terrekomendasikan_pred.to_dict('records')
 
-        indeks_terurut_pred = np.argsort(similarity_scores_pred)[::-1][:k]
-        item_terrekomendasikan_pred = items.iloc[indeks_terurut_pred].copy()  # Add .copy() here
+get_engine = engine_getter(GuideEngine)
 
-        # Mengurutkan berdasarkan Tempat terbaik
-        item_terrekomendasikan_pred = item_terrekomendasikan_pred.sort_values('Tempat', ascending=False)
+# Rekomendasi pemandu hanya bergantung pada Tempat, mode penilaian dan versi model
+guides_cache = cache_from_env('guides', maxsize=512, ttl=6 * 3600)
+guides_flight = SingleFlight('guides')
 
-        # Convert the recommended items to a list of dictionaries
-        return item_terrekomendasikan_pred
+def guides_recommendation(tempat_input, mode=None):
+    engine = get_engine()
+    mode = mode or engine.mode
+    key = (engine.version, mode, tempat_input)
 
-    item_terrekomendasikan = recommend_items(tempat_input, tfidf_matrix, model)
+    def compute():
+        return materialized_or_live(lambda store: store.get_guides(engine.version, tempat_input, mode), lambda: engine.recommend(tempat_input, mode=mode))
 
-    return item_terrekomendasikan
+    return guides_cache.get_or_compute(key, compute, flight=guides_flight)
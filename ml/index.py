@@ -0,0 +1,30 @@
+# Indeks hash dari nilai kolom ke nomor baris (posisi), dibangun sekali bersama data
+# sehingga pencarian baris berdasarkan kota, provinsi, Tempat atau id tidak perlu
+# memindai seluruh DataFrame.
+class LookupIndex:
+    def __init__(self, values):
+        rows = {}
+        for row, value in enumerate(values.tolist() if hasattr(values, 'tolist') else values):
+            # NaN tidak sama dengan dirinya sendiri sehingga tidak bisa dicari, lewati saja
+            if value != value:
+                continue
+            rows.setdefault(value, []).append(row)
+        self._rows = {key: tuple(value) for key, value in rows.items()}
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def keys(self):
+        return self._rows.keys()
+
+    # Semua baris untuk key, tuple kosong jika tidak ditemukan
+    def rows(self, key):
+        return self._rows.get(key, ())
+
+    # Baris pertama untuk key, None jika tidak ditemukan
+    def first(self, key):
+        rows = self._rows.get(key)
+        return rows[0] if rows else None
@@ -1,104 +1,398 @@
-import json
-import pandas as pd
 import numpy as np
-import tensorflow as tf
-from keras.models import load_model
-from sklearn.feature_extraction.text import TfidfVectorizer
-from math import radians, sin, cos, sqrt, atan2
+from ml.runtime import load_model
+from ml.geo import distances_from, pairwise_distances
+from ml.routing import allocate_days, day_allocation, order_cities, plan_days
+from ml.index import LookupIndex
+from ml.retrieval import Retriever
+from ml.spatial import GridIndex
+from ml.snapshot import read_dataset
+from ml.cache import SingleFlight, cache_from_env
+from ml.bundle import BUNDLE_DIR, BundledEngine, engine_getter, tfidf_vocabulary
+from ml.materialize import get_store, materialized_or_live
 
-def generate_itinerary(city_name, num_days):
-    # Memuat dataset
-    data = pd.read_csv('ml/itinerary/wisataindonesia.csv')
+DATA_PATH = 'ml/itinerary/wisataindonesia.csv'
+MODEL_PATH = 'ml/itinerary/recommendation_model.h5'
 
-    # Pra-pemrosesan data
-    data['provinsi'] = data['provinsi'].fillna('')
+ITEM_COLUMNS = ['attraction_id', 'nama', 'kota', 'id_kota', 'provinsi', 'longitude', 'latitude', 'img', 'total_rating', 'category', 'child_price', 'adult_price']
 
-    # Melakukan vektorisasi TF-IDF pada fitur "kota" dan "provinsi"
-    tfidf_kota = TfidfVectorizer()
-    tfidf_provinsi = TfidfVectorizer()
+# Jumlah kandidat teratas yang dibagi ke dalam hari, dan batas jumlah atraksi per hari
+NUM_CANDIDATES = 20
+MAX_STOPS_PER_DAY = 3
 
-    tfidf_matrix_kota = tfidf_kota.fit_transform(data['kota'])
-    tfidf_matrix_provinsi = tfidf_provinsi.fit_transform(data['provinsi'])
+# Jumlah kota serupa yang disiapkan per kota
+SIMILAR_CITIES = 10
 
-    # Menggabungkan matriks TF-IDF
-    tfidf_matrix = np.concatenate((tfidf_matrix_kota.toarray(), tfidf_matrix_provinsi.toarray()), axis=1)
+NOT_FOUND_MESSAGE = 'Tidak ada item yang ditemukan untuk kota yang diberikan.'
 
-    # Model
-    model = load_model('ml/itinerary/recommendation_model.h5')
+# Matriks jarak antar semua atraksi hanya dihitung di muka sampai ukuran ini
+# (float32, 4000 atraksi = 64 MB); di atasnya jarak dihitung per request untuk kandidat saja
+MAX_PRECOMPUTED_DISTANCES = 4000
 
-    # Mendapatkan embedding item
-    item_embeddings = model.predict(tfidf_matrix)
+class ItineraryEngine(BundledEngine):
+    # Dataset, vektorisasi TF-IDF, model dan embedding item dibangun sekali per proses,
+    # atau dibuka dari bundle offline (lihat BundledEngine di ml/bundle.py).
+    def __init__(self, data_path=DATA_PATH, model_path=MODEL_PATH, bundle_dir=BUNDLE_DIR):
+        super().__init__(data_path, model_path, bundle_dir)
+
+    def _prepare(self):
+        self._build_indexes()
+        self.latitudes = self.data['latitude'].to_numpy(dtype=np.float64)
+        self.longitudes = self.data['longitude'].to_numpy(dtype=np.float64)
+        self.spatial = GridIndex(self.latitudes, self.longitudes)
+
+        # Kolom item sebagai array NumPy (struct-of-arrays) untuk menyusun hasil tanpa DataFrame
+        self.columns = {name: self.items[name].to_numpy() for name in ITEM_COLUMNS}
+
+        # Peringkat itinerary sejak awal memakai dot product embedding tanpa normalisasi,
+        # jadi embedding tidak dinormalisasi agar urutan rekomendasi tetap sama
+        self.retriever = Retriever(self.item_embeddings)
+
+        self._build_city_centroids()
+        if self.city_neighbours is None:
+            self.city_embeddings, self.city_neighbours, self.city_neighbour_scores = self._rank_similar_cities()
+
+    def _build(self):
+        # scikit-learn dan scipy hanya dibutuhkan jika bundle tidak tersedia
+        from scipy import sparse
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        # Memuat dataset
+        data = read_dataset(self.data_path)
+
+        # Pra-pemrosesan data
+        data['provinsi'] = data['provinsi'].fillna('')
+
+        # Melakukan vektorisasi TF-IDF pada fitur "kota" dan "provinsi"
+        self.tfidf_kota = TfidfVectorizer()
+        self.tfidf_provinsi = TfidfVectorizer()
+
+        tfidf_matrix_kota = self.tfidf_kota.fit_transform(data['kota'])
+        tfidf_matrix_provinsi = self.tfidf_provinsi.fit_transform(data['provinsi'])
+
+        # Menggabungkan matriks TF-IDF, tetap dalam bentuk sparse (CSR)
+        tfidf_matrix = sparse.hstack((tfidf_matrix_kota, tfidf_matrix_provinsi), format='csr', dtype=np.float32)
+
+        # Model
+        model = load_model(self.model_path)
+
+        # Mendapatkan embedding item
+        self.item_embeddings = model.predict(tfidf_matrix)
+
+        self.data = data
+        self.items = data[ITEM_COLUMNS]
+
+        # Matriks jarak antar atraksi untuk perencanaan rute
+        self.distances = None
+        if len(data) <= MAX_PRECOMPUTED_DISTANCES:
+            self.distances = pairwise_distances(data['latitude'], data['longitude']).astype(np.float32)
+
+        self.city_neighbours = None
+
+    def _load_bundle(self, bundle):
+        # Embedding dan matriks jarak dibuka dengan mmap sehingga dibagi antar worker
+        self.item_embeddings = bundle.array('itinerary/embeddings')
+        self.distances = bundle.array('itinerary/distances') if 'itinerary/distances' in bundle.manifest['arrays'] else None
+        self.data = bundle.frame('itinerary/items')
+        self.data['provinsi'] = self.data['provinsi'].fillna('')
+        self.items = self.data[ITEM_COLUMNS]
+        self.city_embeddings = bundle.array('itinerary/city_embeddings')
+        self.city_neighbours = bundle.array('itinerary/city_neighbours')
+        self.city_neighbour_scores = bundle.array('itinerary/city_neighbour_scores')
+
+    # Menulis embedding, kosakata TF-IDF dan metadata baris ke bundle
+    def export(self, writer):
+        writer.add_sources(*self.sources)
+        writer.save_array('itinerary/embeddings', np.asarray(self.item_embeddings, dtype=np.float32))
+        if self.distances is not None:
+            writer.save_array('itinerary/distances', self.distances)
+        writer.save_json('itinerary/vocab', {
+            'kota': tfidf_vocabulary(self.tfidf_kota),
+            'provinsi': tfidf_vocabulary(self.tfidf_provinsi)
+        })
+        writer.save_frame('itinerary/items', self.items)
+        writer.save_array('itinerary/city_embeddings', self.city_embeddings)
+        writer.save_array('itinerary/city_neighbours', self.city_neighbours)
+        writer.save_array('itinerary/city_neighbour_scores', self.city_neighbour_scores)
+
+    # Indeks kota, id_kota, provinsi dan attraction_id ke nomor baris
+    def _build_indexes(self):
+        self.city_index = LookupIndex(self.data['kota'])
+        self.city_id_index = LookupIndex(self.data['id_kota'])
+        self.province_index = LookupIndex(self.data['provinsi'])
+        self.attraction_index = LookupIndex(self.data['attraction_id'])
+
+    # Titik tengah setiap id_kota dan matriks jarak antar titik tengah, dihitung sekali saat dimuat
+    # untuk perencanaan perjalanan beberapa kota. Dipakai median koordinat atraksi, bukan rata-rata,
+    # karena sebagian koordinat di dataset salah (mis. satu atraksi Bandung tercatat di Madeira)
+    def _build_city_centroids(self):
+        city_ids = sorted(self.city_id_index.keys())
+        rows = [list(self.city_id_index.rows(city_id)) for city_id in city_ids]
+        self.city_ids = city_ids
+        self.city_positions = {city_id: position for position, city_id in enumerate(city_ids)}
+        self.city_sizes = np.array([len(r) for r in rows])
+        self.city_latitudes = np.array([np.median(self.latitudes[r]) for r in rows])
+        self.city_longitudes = np.array([np.median(self.longitudes[r]) for r in rows])
+        self.city_distances = pairwise_distances(self.city_latitudes, self.city_longitudes).astype(np.float32)
+
+    # Embedding kota: rata-rata embedding item per id_kota (urutan sama dengan city_positions),
+    # dinormalisasi, lalu k kota tetangga terdekat (cosine) untuk setiap kota tanpa kota itu sendiri.
+    # Disimpan di bundle sehingga /city/<id>/similar dilayani dari memori tanpa perhitungan model.
+    def _rank_similar_cities(self, k=SIMILAR_CITIES):
+        embeddings = np.array([
+            np.asarray(self.item_embeddings[list(self.city_id_index.rows(city_id))], dtype=np.float64).mean(axis=0)
+            for city_id in self.city_ids
+        ])
+        retriever = Retriever(embeddings, normalize=True)
+        k = min(k, len(embeddings) - 1)
+
+        rows, scores = retriever.search_batch(retriever.matrix, k + 1)
+        neighbours = []
+        neighbour_scores = []
+        for position, (top, top_scores) in enumerate(zip(rows, scores)):
+            others = top != position
+            neighbours.append(top[others][:k])
+            neighbour_scores.append(top_scores[others][:k])
+        return retriever.matrix.astype(np.float32), np.array(neighbours, dtype=np.int32), np.array(neighbour_scores, dtype=np.float32)
+
+    # (id_kota, skor) kota yang paling mirip dengan city_id, list kosong jika tidak dikenal
+    def similar_cities(self, city_id, k=SIMILAR_CITIES):
+        self.load()
+        position = self.city_positions.get(city_id)
+        if position is None:
+            return []
+        return [(self.city_ids[row], score) for row, score in zip(self.city_neighbours[position][:k].tolist(), self.city_neighbour_scores[position][:k].tolist())]
+
+    # Ringkasan kota dari baris pertamanya: nama, provinsi dan gambar
+    def city_summary(self, city_id):
+        rows = self.city_id_index.rows(city_id)
+        if not rows:
+            return None
+        images = [image for image in self.columns['img'][list(rows)].tolist() if isinstance(image, str)]
+        return {
+            'id_kota': city_id,
+            'kota': self.columns['kota'][rows[0]],
+            'provinsi': self.columns['provinsi'][rows[0]],
+            'img': min(images) if images else None
+        }
 
     # Mendapatkan indeks item berdasarkan input kota
-    def get_item_index_by_kota(kota, data):
-        index = data[data['kota'] == kota].index
-        return index[0] if len(index) > 0 else None
+    def get_item_index_by_kota(self, kota):
+        return self.city_index.first(kota)
+
+    def rows_by_city(self, kota):
+        return self.city_index.rows(kota)
+
+    def rows_by_province(self, provinsi):
+        return self.province_index.rows(provinsi)
 
-    # Menghitung jarak antara dua titik berdasarkan lintang dan bujur formula haversine
-    def calculate_distance(lat1, lon1, lat2, lon2):
-        R = 6371  # Jari-jari bumi dalam kilometer
+    def row_by_attraction_id(self, attraction_id):
+        return self.attraction_index.first(attraction_id)
 
-        lat1_rad = radians(lat1)
-        lon1_rad = radians(lon1)
-        lat2_rad = radians(lat2)
-        lon2_rad = radians(lon2)
+    # Nama kota untuk id_kota, None jika tidak ada di dataset
+    def city_name(self, city_id):
+        row = self.city_id_index.first(city_id)
+        return None if row is None else self.data['kota'].iat[row]
 
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
+    # Submatriks jarak antar baris yang diberikan
+    def distances_between(self, rows):
+        if self.distances is not None:
+            return self.distances[np.ix_(rows, rows)]
+        return pairwise_distances(self.latitudes[rows], self.longitudes[rows])
 
-        a = sin(dlat/2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon/2) ** 2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
+    # Peringkat k item teratas untuk banyak item awal sekaligus dengan satu perkalian matriks.
+    # Skor sama (lihat ml/ranking.py) diurutkan dari indeks terkecil agar hasil per kota dan batch identik.
+    # mask (lihat candidate_mask) membatasi kandidat untuk semua item awal.
+    def rank(self, indeks_items, k=NUM_CANDIDATES, mask=None):
+        self.load()
+        rows, _ = self.retriever.search_batch(self.item_embeddings[np.asarray(indeks_items)], k, mask)
+        return np.array(rows)
 
-        distance = R * c
-        return distance
+    # Mask baris yang boleh menjadi kandidat, None jika tidak ada filter.
+    # near: (lat, lon, radius_km), hanya atraksi dalam radius dari titik tersebut.
+    def candidate_mask(self, category=None, max_adult_price=None, exclude_ids=None, province=None, near=None):
+        conditions = []
+        if category is not None:
+            conditions.append(self.columns['category'] == category)
+        if max_adult_price is not None:
+            conditions.append(self.columns['adult_price'] <= max_adult_price)
+        if exclude_ids:
+            conditions.append(~np.isin(self.columns['attraction_id'], list(exclude_ids)))
+        if province is not None:
+            conditions.append(self.columns['provinsi'] == province)
+        if near is not None:
+            nearby = np.zeros(len(self.latitudes), dtype=bool)
+            nearby[self.spatial.within(*near)[0]] = True
+            conditions.append(nearby)
+        if not conditions:
+            return None
+        return np.logical_and.reduce(conditions)
 
-    # Merekomendasikan item berdasarkan kota dan durasi liburan yang diberikan
-    def recommend_items(kota, durasi, item_embeddings, items=data[['attraction_id', 'nama', 'kota', 'id_kota', 'provinsi','longitude','latitude','img','total_rating', 'category', 'child_price', 'adult_price']], k=5):
-        indeks_item = get_item_index_by_kota(kota, data)
+    # Record (dict) untuk baris-baris item, ditambah kolom tambahan per baris.
+    # tolist() menghasilkan tipe Python biasa sehingga hasilnya langsung bisa di-JSON-kan.
+    def records(self, rows, **extra):
+        columns = {name: values[rows].tolist() for name, values in self.columns.items()}
+        columns.update((name, np.asarray(values).tolist()) for name, values in extra.items())
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    # Membagi kandidat terurut ke dalam hari dan menyusun rute untuk item awal indeks_item
+    def plan(self, indeks_item, indeks_terurut, durasi):
+        # Membagi item terrekomendasikan secara merata berdasarkan durasi liburan,
+        # lalu batasi jumlah atraksi per hari menjadi 3
+        alokasi_hari = np.minimum(day_allocation(len(indeks_terurut), durasi), MAX_STOPS_PER_DAY)
+        kandidat = indeks_terurut[:alokasi_hari.sum()]
+
+        # Menghitung jarak antara atraksi dan kota yang diberikan
+        jarak_kota = distances_from(self.latitudes[indeks_item], self.longitudes[indeks_item], self.latitudes[kandidat], self.longitudes[kandidat])
+
+        # Mengelompokkan kandidat per hari secara geografis dan mengurutkan rute setiap hari
+        urutan, hari = plan_days(self.distances_between(kandidat), jarak_kota, alokasi_hari)
+
+        return self.records(kandidat[urutan], hari=hari, jarak=jarak_kota[urutan])
+
+    # Atraksi dalam radius_km dari (lat, lon) sebagai record dengan kolom jarak, urut dari yang terdekat
+    def nearby(self, lat, lon, radius_km, limit=None):
+        self.load()
+        rows, distances = self.spatial.within(lat, lon, radius_km)
+        return self.records(rows[:limit], jarak=distances[:limit])
+
+    # Merekomendasikan item berdasarkan kota dan durasi liburan yang diberikan.
+    # Filter kandidat: kategori, harga dewasa maksimum, attraction_id yang sudah dikunjungi,
+    # hanya atraksi di provinsi yang sama dengan kota tujuan, dan jarak maksimum dari kota tujuan.
+    def recommend_items(self, kota, durasi, k=NUM_CANDIDATES, category=None, max_adult_price=None, exclude_ids=None, same_province=False, max_distance_km=None):
+        self.load()
+
+        indeks_item = self.get_item_index_by_kota(kota)
         if indeks_item is None:
-            return pd.DataFrame()  # Mengembalikan dataframe kosong jika kota tidak ditemukan
+            return []  # Mengembalikan list kosong jika kota tidak ditemukan
 
-        vektor_item = item_embeddings[indeks_item]
-        similarity_scores = np.dot(item_embeddings, vektor_item)
-        indeks_terurut = np.argsort(similarity_scores)[::-1][:k]
-        item_terrekomendasikan = items.iloc[indeks_terurut].copy()
+        province = self.columns['provinsi'][indeks_item] if same_province else None
+        near = None if max_distance_km is None else (self.latitudes[indeks_item], self.longitudes[indeks_item], max_distance_km)
+        mask = self.candidate_mask(category, max_adult_price, exclude_ids, province, near)
+        indeks_terurut, _ = self.retriever.search(self.item_embeddings[indeks_item], k, mask)
+        return self.plan(indeks_item, indeks_terurut, durasi)
 
-        # Membagi item terrekomendasikan secara merata berdasarkan durasi liburan
-        jumlah_terrekomendasikan = len(item_terrekomendasikan)
-        jumlah_hari = durasi
-        item_per_hari = jumlah_terrekomendasikan // jumlah_hari
-        sisa = jumlah_terrekomendasikan % jumlah_hari
+    def recommend(self, city_name, num_days, **filters):
+        item_terrekomendasikan = self.recommend_items(city_name, num_days, **filters)
 
-        alokasi_hari = [item_per_hari] * jumlah_hari
-        for i in range(sisa):
-            alokasi_hari[i] += 1
+        if item_terrekomendasikan:
+            return item_terrekomendasikan
+        return {'message': NOT_FOUND_MESSAGE}
 
-        item_terrekomendasikan['hari'] = np.repeat(range(1, jumlah_hari + 1), alokasi_hari)[:jumlah_terrekomendasikan]
-        item_terrekomendasikan = item_terrekomendasikan.sort_values('hari')
+    # Rencana perjalanan beberapa kota (id_kota) dengan total_days hari: urutan kota dan jumlah
+    # hari per kota. Tanpa keep_order kota diurutkan ulang (mulai dari kota pertama) agar total
+    # jarak antar titik tengah kota minimal. Hari dibagi sebanding dengan jumlah atraksi kota,
+    # dibatasi jumlah kandidat per itinerary, minimal 1 hari per kota.
+    def plan_trip(self, city_ids, total_days, keep_order=False):
+        self.load()
 
-        # Batasi jumlah atraksi per hari menjadi 3
-        item_terrekomendasikan = item_terrekomendasikan.groupby('hari').head(3)
+        city_ids = list(dict.fromkeys(city_ids))
+        unknown = [city_id for city_id in city_ids if city_id not in self.city_positions]
+        if unknown:
+            raise ValueError(f"Unknown id_kota: {', '.join(map(str, unknown))}")
 
-        # Menghitung jarak antara atraksi dan kota yang diberikan
-        lintang_kota = items.loc[indeks_item, 'latitude']
-        bujur_kota = items.loc[indeks_item, 'longitude']
-        item_terrekomendasikan['jarak'] = item_terrekomendasikan.apply(
-            lambda row: calculate_distance(row['latitude'], row['longitude'], lintang_kota, bujur_kota),
-            axis=1
-        )
-        item_terrekomendasikan = item_terrekomendasikan.sort_values('jarak')
-
-        return item_terrekomendasikan
-
-    # Replace kota_input and durasi_input with the city_name and num_days arguments respectively
-    item_terrekomendasikan = recommend_items(city_name, num_days, item_embeddings, items=data[['attraction_id', 'nama', 'kota', 'id_kota', 'provinsi','longitude','latitude','img','total_rating', 'category', 'child_price', 'adult_price']], k=20)
-
-    if not item_terrekomendasikan.empty:
-        output = item_terrekomendasikan.to_dict(orient='records')
-        json_output = json.dumps(output)
-        print(json_output)
-        return json.loads(json_output)
-    else:
-        output = {'message': 'Tidak ada item yang ditemukan untuk kota yang diberikan.'}
-        json_output = json.dumps(output)
-        return json.loads(json_output)
+        positions = [self.city_positions[city_id] for city_id in city_ids]
+        distances = self.city_distances[np.ix_(positions, positions)]
+        urutan = list(range(len(positions))) if keep_order else order_cities(distances)
+        durasi = allocate_days(total_days, np.minimum(self.city_sizes[positions], NUM_CANDIDATES)[urutan])
+
+        legs = []
+        hari_mulai = 1
+        for leg, (index, days) in enumerate(zip(urutan, durasi.tolist())):
+            legs.append({
+                'id_kota': city_ids[index],
+                'kota': self.city_name(city_ids[index]),
+                'hari_mulai': hari_mulai,
+                'durasi': days,
+                'jarak': 0.0 if leg == 0 else float(distances[urutan[leg - 1], index])
+            })
+            hari_mulai += days
+        return legs
+
+    # Itinerary untuk banyak pasangan (kota, jumlah hari) sekaligus: semua item awal diberi skor
+    # dengan satu perkalian matriks, lalu setiap pasangan direncanakan dari kandidat kotanya.
+    # Hasilnya sama dengan recommend() untuk setiap pasangan.
+    def recommend_batch(self, pairs, k=NUM_CANDIDATES):
+        self.load()
+
+        seeds = {}
+        for city_name, _ in pairs:
+            indeks_item = self.get_item_index_by_kota(city_name)
+            if indeks_item is not None:
+                seeds.setdefault(city_name, indeks_item)
+        ranked = dict(zip(seeds, self.rank(list(seeds.values()), k))) if seeds else {}
+
+        results = []
+        for city_name, num_days in pairs:
+            item_terrekomendasikan = []
+            if city_name in ranked:
+                item_terrekomendasikan = self.plan(seeds[city_name], ranked[city_name], num_days)
+            results.append(item_terrekomendasikan or {'message': NOT_FOUND_MESSAGE})
+        return results
+
+get_engine = engine_getter(ItineraryEngine)
+
+# Hasil itinerary hanya bergantung pada kota, jumlah hari dan versi model
+itinerary_cache = cache_from_env('itinerary', maxsize=512, ttl=6 * 3600)
+itinerary_flight = SingleFlight('itinerary')
+
+# Filter yang tidak aktif dibuang dan exclude_ids dijadikan frozenset supaya bisa menjadi bagian key cache
+def _normalize_filters(filters):
+    filters = {name: value for name, value in filters.items() if value is not None and value is not False}
+    if 'exclude_ids' in filters:
+        filters['exclude_ids'] = frozenset(filters['exclude_ids'])
+        if not filters['exclude_ids']:
+            del filters['exclude_ids']
+    return filters
+
+def _cache_key(engine, city_name, num_days, filters):
+    return (engine.version, city_name, num_days, tuple(sorted(filters.items())))
+
+# filters: category, max_adult_price, exclude_ids, same_province, max_distance_km (lihat ItineraryEngine.recommend_items)
+def generate_itinerary(city_name, num_days, **filters):
+    engine = get_engine()
+    filters = _normalize_filters(filters)
+    key = _cache_key(engine, city_name, num_days, filters)
+
+    def compute():
+        # Hasil materialisasi hanya untuk itinerary tanpa filter
+        if filters:
+            return engine.recommend(city_name, num_days, **filters)
+        return materialized_or_live(lambda store: store.get_itinerary(engine.version, city_name, num_days), lambda: engine.recommend(city_name, num_days))
+
+    return itinerary_cache.get_or_compute(key, compute, flight=itinerary_flight)
+
+# Itinerary untuk daftar (nama kota, jumlah hari), sesuai urutan masukan. Pasangan yang ada di
+# cache atau hasil materialisasi tidak dihitung ulang; sisanya dihitung bersama dengan recommend_batch.
+def generate_itineraries(pairs):
+    engine = get_engine()
+    store = get_store()
+    results = {}
+    missing = []
+    for pair in dict.fromkeys(pairs):
+        city_name, num_days = pair
+        hit, output = itinerary_cache.get(_cache_key(engine, city_name, num_days, {}))
+        if not hit and store is not None:
+            output = store.get_itinerary(engine.version, city_name, num_days)
+            hit = output is not None
+            if hit:
+                itinerary_cache.set(_cache_key(engine, city_name, num_days, {}), output)
+        if hit:
+            results[pair] = output
+        else:
+            missing.append(pair)
+
+    if missing:
+        for pair, output in zip(missing, engine.recommend_batch(missing)):
+            itinerary_cache.set(_cache_key(engine, pair[0], pair[1], {}), output)
+            results[pair] = output
+
+    return [results[pair] for pair in pairs]
+
+# Perjalanan beberapa kota: rencana dari plan_trip, setiap kota dilengkapi itinerary untuk
+# jumlah harinya (dihitung bersama dengan generate_itineraries)
+def generate_trip(city_ids, total_days, keep_order=False):
+    engine = get_engine()
+    legs = engine.plan_trip(city_ids, total_days, keep_order)
+    itineraries = generate_itineraries([(leg['kota'], leg['durasi']) for leg in legs])
+    return [dict(leg, itinerary=itinerary) for leg, itinerary in zip(legs, itineraries)]
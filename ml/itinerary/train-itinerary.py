@@ -7,14 +7,24 @@ from keras.layers import Input, Dense
 from keras.optimizers import Adam
 from sklearn.feature_extraction.text import TfidfVectorizer
 from datetime import datetime
+import os
 import pickle
+import sys
 from sklearn.metrics.pairwise import cosine_similarity
 
+# Dijalankan sebagai `python ml/itinerary/train-itinerary.py` dari root repository; root
+# ditambahkan ke sys.path supaya modul ml.* bisa diimpor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ml.geo import distances_from
+from ml.index import LookupIndex
+from ml.snapshot import read_dataset
+
 # Menghapus sesi TensorFlow sebelumnya
 tf.keras.backend.clear_session()
 
 # Memuat dataset
-data = pd.read_csv('ml/itinerary/wisataindonesia.csv')
+data = read_dataset('ml/itinerary/wisataindonesia.csv')
 
 # Pra-pemrosesan data
 data['kota'] = data['kota'].fillna('Unknown')
@@ -58,35 +68,16 @@ model.fit(tfidf_matrix, tfidf_matrix, epochs=10, batch_size=32)
 model.save('ml/itinerary/recommendation_model.h5')
 
 # Mendapatkan indeks item berdasarkan input kota
-def get_item_index_by_kota(kota, data):
-    index = data[data['kota'] == kota].index
-    return index[0] if len(index) > 0 else None
-
-from math import radians, sin, cos, sqrt, atan2
-
-# Menghitung jarak antara dua titik berdasarkan lintang dan bujur formula haversine
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # Jari-jari bumi dalam kilometer
-
-    lat1_rad = radians(lat1)
-    lon1_rad = radians(lon1)
-    lat2_rad = radians(lat2)
-    lon2_rad = radians(lon2)
-
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-
-    a = sin(dlat/2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon/2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
+city_index = LookupIndex(data['kota'])
 
-    distance = R * c
-    return distance
+def get_item_index_by_kota(kota):
+    return city_index.first(kota)
 
 import random
 
 # Merekomendasikan item berdasarkan kota dan durasi liburan yang diberikan
 def recommend_items(kota, durasi, items=data[['attraction_id', 'nama', 'kota', 'id_kota', 'provinsi','longitude','latitude','img','total_rating']], k=5):
-    indeks_item = get_item_index_by_kota(kota, data)
+    indeks_item = get_item_index_by_kota(kota)
     if indeks_item is None:
         return pd.DataFrame()  # Mengembalikan dataframe kosong jika kota tidak ditemukan
     item_embedding = tfidf_matrix[indeks_item]
@@ -125,9 +116,8 @@ def recommend_items(kota, durasi, items=data[['attraction_id', 'nama', 'kota', '
     # Menghitung jarak antara atraksi dan kota yang diberikan
     lintang_kota = items.loc[indeks_item, 'latitude']
     bujur_kota = items.loc[indeks_item, 'longitude']
-    item_terrekomendasikan['jarak'] = item_terrekomendasikan.apply(
-        lambda row: calculate_distance(row['latitude'], row['longitude'], lintang_kota, bujur_kota),
-        axis=1
+    item_terrekomendasikan['jarak'] = distances_from(
+        lintang_kota, bujur_kota, item_terrekomendasikan['latitude'], item_terrekomendasikan['longitude']
     )
     item_terrekomendasikan = item_terrekomendasikan.sort_values('jarak')
 
@@ -0,0 +1,169 @@
+# Materialisasi offline itinerary dan rekomendasi pemandu untuk semua kota.
+#
+# Dijalankan dari root repository:
+#
+#     python -m ml.materialize --max-days 7
+#
+# Hasilnya ditulis ke satu file JSON (MATERIALIZED_PATH). generate_itinerary() dan
+# guides_recommendation() melayani dari file ini selama versi model dan datanya sama,
+# dan kembali menghitung langsung untuk kota/jumlah hari yang tidak ada di dalamnya.
+#
+# Job ini inkremental: setiap kota punya fingerprint dari kandidat atraksinya (hasil
+# peringkat model dan isi barisnya) serta rekomendasi pemandunya, dan kota yang
+# fingerprint-nya tidak berubah tidak dihitung ulang.
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Naikkan jika isi atau cara perhitungan itinerary berubah sehingga file lama tidak dipakai
+STORE_FORMAT = 2
+MATERIALIZED_PATH = os.getenv('MATERIALIZED_PATH', 'ml/artifacts/materialized.json')
+
+class MaterializedStore:
+    def __init__(self, payload):
+        self.payload = payload
+        self.max_days = payload['max_days']
+        self.versions = payload['versions']
+        self.cities = payload['cities']
+
+    @classmethod
+    def load(cls, path=MATERIALIZED_PATH):
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            payload = json.load(file)
+        if payload.get('format') != STORE_FORMAT:
+            print(f"Ignoring materialized store at {path}: format {payload.get('format')} != {STORE_FORMAT}")
+            return None
+        return cls(payload)
+
+    # None jika tidak ada di store atau dibuat dari versi model/data lain
+    def get_itinerary(self, version, city_name, num_days):
+        if version != self.versions.get('itinerary'):
+            return None
+        city = self.cities.get(city_name)
+        if city is None:
+            return None
+        return city['itineraries'].get(str(num_days))
+
+    def get_guides(self, version, tempat, mode='model'):
+        if version != self.versions.get('guides'):
+            return None
+        # Store lama belum mencatat mode, isinya selalu dari mode model
+        if mode != self.payload.get('guides_mode', 'model'):
+            return None
+        city = self.cities.get(tempat)
+        return None if city is None else city['guides']
+
+_store = None
+_store_loaded = False
+_store_lock = threading.Lock()
+
+# Store dimuat sekali per proses; None jika belum pernah dibangun
+def get_store():
+    global _store, _store_loaded
+    if not _store_loaded:
+        with _store_lock:
+            if not _store_loaded:
+                _store = MaterializedStore.load()
+                _store_loaded = True
+    return _store
+
+# Hasil dari store jika ada (lookup(store) bukan None), selain itu dihitung langsung dengan compute()
+def materialized_or_live(lookup, compute):
+    store = get_store()
+    if store is not None:
+        output = lookup(store)
+        if output is not None:
+            return output
+    return compute()
+
+def _fingerprint(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def materialize(max_days, path=MATERIALIZED_PATH, force=False):
+    from ml.itinerary.itinerary import NUM_CANDIDATES, get_engine as get_itinerary_engine
+    from ml.guides.guides import get_engine as get_guides_engine
+
+    started = time.perf_counter()
+    itinerary_engine = get_itinerary_engine()
+    guides_engine = get_guides_engine()
+    loaded = time.perf_counter()
+
+    previous = None if force else MaterializedStore.load(path)
+    previous_cities = previous.cities if previous is not None and previous.max_days >= max_days else {}
+
+    # Peringkat kandidat untuk semua kota dengan satu perkalian matriks
+    cities = list(itinerary_engine.city_index.keys())
+    seeds = [itinerary_engine.get_item_index_by_kota(city) for city in cities]
+    ranked = itinerary_engine.rank(seeds, NUM_CANDIDATES)
+    items = itinerary_engine.items
+    ranked_at = time.perf_counter()
+
+    result = {}
+    computed = 0
+    for city, seed, candidates in zip(cities, seeds, ranked):
+        guides = guides_engine.recommend(city)
+        fingerprint = _fingerprint({
+            'max_days': max_days,
+            'candidates': items.iloc[candidates].to_dict('records'),
+            'guides': guides
+        })
+
+        cached = previous_cities.get(city)
+        if cached is not None and cached['fingerprint'] == fingerprint:
+            result[city] = {
+                'fingerprint': fingerprint,
+                'itineraries': {d: cached['itineraries'][d] for d in map(str, range(1, max_days + 1))},
+                'guides': cached['guides']
+            }
+            continue
+
+        itineraries = {}
+        for num_days in range(1, max_days + 1):
+            itineraries[str(num_days)] = itinerary_engine.plan(seed, candidates, num_days)
+        result[city] = {'fingerprint': fingerprint, 'itineraries': itineraries, 'guides': guides}
+        computed += 1
+    planned = time.perf_counter()
+
+    payload = {
+        'format': STORE_FORMAT,
+        'created_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'max_days': max_days,
+        'versions': {'itinerary': itinerary_engine.version, 'guides': guides_engine.version},
+        'guides_mode': guides_engine.mode,
+        'cities': result
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(payload, file)
+    os.replace(tmp_path, path)
+    written = time.perf_counter()
+
+    return {
+        'cities': len(cities),
+        'computed': computed,
+        'reused': len(cities) - computed,
+        'itineraries': computed * max_days,
+        'load_s': loaded - started,
+        'rank_s': ranked_at - loaded,
+        'plan_s': planned - ranked_at,
+        'write_s': written - planned
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute itineraries and guide recommendations for every city')
+    parser.add_argument('--max-days', type=int, default=7)
+    parser.add_argument('--output', default=MATERIALIZED_PATH)
+    parser.add_argument('--force', action='store_true', help='recompute every city even if its fingerprint is unchanged')
+    args = parser.parse_args()
+
+    report = materialize(args.max_days, args.output, args.force)
+    plan_rate = report['itineraries'] / report['plan_s'] if report['plan_s'] else float('inf')
+    print(f"{report['cities']} cities: {report['computed']} computed, {report['reused']} unchanged")
+    print(f"  load {report['load_s']:.2f}s  rank {report['rank_s'] * 1000:.1f}ms  plan {report['plan_s']:.2f}s ({plan_rate:.0f} itineraries/s)  write {report['write_s']:.2f}s")
+    print(f"Written to {args.output}")
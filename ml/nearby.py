@@ -0,0 +1,46 @@
+# Event terdekat dari suatu titik, dilayani dari indeks spasial di memori.
+#
+# events.csv tidak menyimpan koordinat; setiap event terhubung ke POI lewat attraction_id
+# sehingga ditempatkan di koordinat POI tersebut. POI terdekat dicari langsung dengan
+# indeks spasial milik ItineraryEngine (ItineraryEngine.nearby).
+import threading
+import numpy as np
+from ml.snapshot import read_dataset
+from ml.spatial import GridIndex
+
+EVENTS_PATH = 'events.csv'
+
+EVENT_COLUMNS = ['attraction_id', 'nama', 'kota', 'date', 'img']
+
+class EventLocator:
+    def __init__(self, itinerary_engine, events_path=EVENTS_PATH):
+        events = read_dataset(events_path)
+        rows = [itinerary_engine.row_by_attraction_id(attraction_id) for attraction_id in events['attraction_id'].tolist()]
+        located = np.array([row is not None for row in rows], dtype=bool)
+        poi_rows = np.array([row for row in rows if row is not None], dtype=np.int64)
+
+        # Event tanpa POI yang cocok tidak punya lokasi dan tidak pernah ditemukan
+        self.columns = {name: events[name].to_numpy()[located] for name in EVENT_COLUMNS}
+        self.spatial = GridIndex(itinerary_engine.latitudes[poi_rows], itinerary_engine.longitudes[poi_rows])
+
+    # Event dalam radius_km dari (lat, lon) sebagai record dengan kolom jarak, urut dari yang terdekat
+    def nearby(self, lat, lon, radius_km, limit=None):
+        rows, distances = self.spatial.within(lat, lon, radius_km)
+        rows, distances = rows[:limit], distances[:limit]
+        columns = {name: values[rows].tolist() for name, values in self.columns.items()}
+        columns['jarak'] = distances.tolist()
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+# Satu indeks per proses, dibuat saat pertama kali dibutuhkan
+_locator = None
+_locator_lock = threading.Lock()
+
+def get_event_locator():
+    from ml.itinerary.itinerary import get_engine
+
+    global _locator
+    if _locator is None:
+        with _locator_lock:
+            if _locator is None:
+                _locator = EventLocator(get_engine())
+    return _locator
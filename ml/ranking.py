@@ -0,0 +1,39 @@
+# Pemilihan top-k tanpa mengurutkan seluruh skor.
+#
+# np.argpartition memilih k skor terbesar dalam O(n), lalu hanya k hasil tersebut yang
+# diurutkan: skor menurun, skor sama diurutkan dari indeks terkecil. Skor yang sama dengan
+# skor ke-k (di batas) juga diambil dari indeks terkecil, sehingga hasilnya sama dengan
+# np.lexsort((np.arange(n), -rank_scores(scores)))[:k] dan tidak bergantung pada versi NumPy.
+#
+# Urutan ini berbeda dengan np.argsort(scores)[::-1] yang dipakai sebelumnya untuk skor
+# yang sama (argsort tidak stabil); karena semua atraksi satu kota punya embedding yang
+# sama, atraksi yang dipilih untuk sebagian kota berubah satu kali.
+#
+# Skor float32 dari BLAS bisa berbeda beberapa bit terakhir untuk baris yang identik,
+# tergantung jumlah query dalam satu perkalian matriks. Sebelum dibandingkan, RANK_BITS bit
+# terakhir mantissa dibuang (presisi relatif sekitar 3e-5), sehingga skor yang hanya berbeda
+# karena pembulatan dianggap sama dan urutannya ditentukan indeks baris.
+import numpy as np
+
+RANK_BITS = 8
+
+# Skor float32 tanpa RANK_BITS bit terakhir mantissa. Pemotongan ke arah nol tidak pernah
+# membalik urutan dua skor, hanya menyamakan skor yang sangat berdekatan.
+def rank_scores(scores):
+    scores = np.ascontiguousarray(scores, dtype=np.float32)
+    return (scores.view(np.int32) & np.int32(~((1 << RANK_BITS) - 1))).view(np.float32)
+
+def top_k(scores, k):
+    scores = rank_scores(scores)
+    n = scores.shape[0]
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k >= n:
+        return np.lexsort((np.arange(n), -scores))
+
+    top = np.argpartition(scores, n - k)[n - k:]
+    kth = scores[top].min()
+    above = top[scores[top] > kth]
+    tied = np.flatnonzero(scores == kth)[:k - len(above)]
+    rows = np.concatenate((above, tied))
+    return rows[np.lexsort((rows, -scores[rows]))]
@@ -0,0 +1,66 @@
+# Retrieval top-k atas matriks item (dense atau scipy.sparse CSR).
+#
+# Skor adalah perkalian matriks item dengan vektor query; top-k dipilih dengan
+# argpartition (lihat ml/ranking.py) sehingga katalog tidak diurutkan penuh setiap request.
+# Filter kandidat diberikan sebagai mask boolean per baris dan diterapkan sebelum
+# perhitungan skor: hanya baris yang lolos filter yang dihitung dan dipilih, jadi tidak
+# perlu mengambil lebih banyak kandidat lalu menyaring dan mengurutkan ulang.
+import numpy as np
+from ml.ranking import top_k
+
+# Normalisasi L2 per baris, baris nol tetap nol (sama seperti cosine_similarity).
+# Matriks scipy.sparse tetap sparse (CSR).
+def normalize_rows(matrix):
+    if hasattr(matrix, 'tocsr'):
+        matrix = matrix.tocsr().astype(np.float32)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(np.float32)
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (matrix / norms).astype(np.float32)
+
+class Retriever:
+    # matrix: satu baris per item. Dengan normalize=True baris dinormalisasi L2 sekali di sini
+    # sehingga skor terhadap query yang juga ternormalisasi adalah cosine similarity.
+    def __init__(self, matrix, normalize=False):
+        # Matriks dense dipakai apa adanya (tidak disalin), sehingga embedding yang di-mmap dari
+        # bundle tetap dibagi antar worker
+        self.matrix = normalize_rows(matrix) if normalize else matrix
+        self.size = matrix.shape[0]
+        self._sparse = hasattr(self.matrix, 'tocsr')
+
+    # Satu perkalian matriks untuk semua query; hasil float32 bisa berbeda di bit terakhir
+    # tergantung jumlah query, dan top_k mengabaikan perbedaan sekecil itu
+    def _dot(self, matrix, queries):
+        queries = np.asarray(queries, dtype=np.float32)
+        if self._sparse:
+            return np.asarray(matrix @ queries.T).T
+        return queries @ matrix.T
+
+    # Skor semua baris untuk setiap query, bentuk (len(queries), jumlah baris)
+    def scores(self, queries):
+        return self._dot(self.matrix, queries)
+
+    # (baris, skor) k teratas untuk satu query; mask membatasi baris yang boleh dipilih
+    def search(self, query, k, mask=None):
+        rows, scores = self.search_batch(np.asarray(query)[None, :], k, mask)
+        return rows[0], scores[0]
+
+    # (baris, skor) k teratas untuk setiap query, masing-masing list array per query
+    def search_batch(self, queries, k, mask=None):
+        if mask is None:
+            candidates = None
+            scores = self.scores(queries)
+        else:
+            candidates = np.flatnonzero(mask)
+            scores = self._dot(self.matrix[candidates], queries)
+
+        rows = []
+        selected = []
+        for query_scores in scores:
+            top = top_k(query_scores, k)
+            rows.append(top if candidates is None else candidates[top])
+            selected.append(query_scores[top])
+        return rows, selected
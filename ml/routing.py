@@ -0,0 +1,142 @@
+# Perencanaan rute per hari untuk itinerary.
+#
+# Kandidat atraksi dikelompokkan secara geografis menjadi satu kelompok per hari
+# (k-medoids dengan kapasitas per hari), lalu urutan kunjungan di setiap hari
+# dicari dengan nearest-neighbour + 2-opt di atas matriks jarak yang sudah dihitung.
+# Jumlah kandidat per request kecil (<= 3 per hari), jadi seluruh tahap ini hanya
+# butuh beberapa milidetik.
+import numpy as np
+
+# Pembagian n item secara merata ke sejumlah hari, hari awal mendapat sisa pembagian
+def day_allocation(n, num_days):
+    alokasi = np.full(num_days, n // num_days, dtype=np.int64)
+    alokasi[:n % num_days] += 1
+    return alokasi
+
+# Membagi total_days ke beberapa kota: setiap kota minimal 1 hari, sisanya sebanding dengan
+# bobot (metode sisa terbesar), sisa yang sama dimenangkan kota yang lebih awal
+def allocate_days(total_days, weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    if total_days < len(weights):
+        raise ValueError(f"{total_days} days is not enough for {len(weights)} cities")
+
+    alokasi = np.ones(len(weights), dtype=np.int64)
+    remaining = total_days - len(weights)
+    if remaining > 0:
+        share = weights / weights.sum() * remaining
+        alokasi += np.floor(share).astype(np.int64)
+        sisa = total_days - alokasi.sum()
+        alokasi[np.argsort(-(share - np.floor(share)), kind='stable')[:sisa]] += 1
+    return alokasi
+
+# Titik awal medoid: titik terdekat ke kota tujuan, lalu titik terjauh dari medoid yang sudah dipilih
+def _initial_medoids(distances, start_distances, num_clusters):
+    medoids = [int(np.argmin(start_distances))]
+    nearest = distances[medoids[0]].copy()
+    while len(medoids) < num_clusters:
+        candidate = int(np.argmax(nearest))
+        medoids.append(candidate)
+        nearest = np.minimum(nearest, distances[candidate])
+    return medoids
+
+# Setiap titik dipasangkan ke medoid terdekat yang kapasitasnya masih ada, mulai dari pasangan terdekat
+def _assign(distances, medoids, capacities):
+    n = distances.shape[0]
+    pair_distances = distances[:, medoids]
+    labels = np.full(n, -1, dtype=np.int64)
+    remaining = np.array(capacities, dtype=np.int64)
+
+    for flat in np.argsort(pair_distances, axis=None, kind='stable'):
+        point, cluster = divmod(int(flat), len(medoids))
+        if labels[point] == -1 and remaining[cluster] > 0:
+            labels[point] = cluster
+            remaining[cluster] -= 1
+    return labels
+
+def balanced_clusters(distances, start_distances, capacities, max_iterations=10):
+    capacities = [int(c) for c in capacities]
+    medoids = _initial_medoids(distances, start_distances, len(capacities))
+    labels = _assign(distances, medoids, capacities)
+
+    for _ in range(max_iterations):
+        new_medoids = []
+        for cluster in range(len(capacities)):
+            members = np.flatnonzero(labels == cluster)
+            # Medoid baru: anggota dengan total jarak terkecil ke anggota lain
+            costs = distances[np.ix_(members, members)].sum(axis=1)
+            new_medoids.append(int(members[np.argmin(costs)]))
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+        labels = _assign(distances, medoids, capacities)
+
+    return labels
+
+def _path_length(distances, path):
+    return float(sum(distances[a, b] for a, b in zip(path[:-1], path[1:])))
+
+# Rute terbuka: mulai dari titik `start`, selalu lanjut ke titik terdekat yang belum dikunjungi
+def nearest_neighbour_route(distances, points, start):
+    route = [start]
+    remaining = [p for p in points if p != start]
+    while remaining:
+        last = route[-1]
+        nearest = min(remaining, key=lambda p: distances[last, p])
+        route.append(nearest)
+        remaining.remove(nearest)
+    return route
+
+# Perbaikan 2-opt untuk rute terbuka dengan titik awal tetap
+def two_opt(distances, route, max_passes=20):
+    route = list(route)
+    n = len(route)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b = route[i - 1], route[i]
+                c = route[j]
+                d = route[j + 1] if j + 1 < n else None
+
+                before = distances[a, b] + (distances[c, d] if d is not None else 0)
+                after = distances[a, c] + (distances[b, d] if d is not None else 0)
+                if after < before - 1e-9:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+    return route
+
+# Urutan kunjungan beberapa kota dengan rute terbuka yang dimulai dari kota pertama
+def order_cities(distances):
+    distances = np.asarray(distances, dtype=np.float64)
+    return two_opt(distances, nearest_neighbour_route(distances, list(range(distances.shape[0])), 0))
+
+# Mengembalikan (urutan, hari): urutan adalah indeks titik sesuai urutan kunjungan,
+# hari adalah nomor hari (mulai 1) untuk setiap titik pada urutan tersebut.
+# Hari dengan kapasitas 0 dilewati, sama seperti pembagian sebelumnya.
+def plan_days(distances, start_distances, capacities):
+    distances = np.asarray(distances, dtype=np.float64)
+    start_distances = np.asarray(start_distances, dtype=np.float64)
+    active = [c for c in capacities if c > 0]
+    if not active:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    labels = balanced_clusters(distances, start_distances, active)
+
+    routes = []
+    for cluster in range(len(active)):
+        members = [int(p) for p in np.flatnonzero(labels == cluster)]
+        start = min(members, key=lambda p: start_distances[p])
+        route = two_opt(distances, nearest_neighbour_route(distances, members, start))
+        routes.append(route)
+
+    # Hari pertama adalah kelompok yang paling dekat ke kota tujuan
+    routes.sort(key=lambda route: start_distances[route[0]])
+
+    urutan = []
+    hari = []
+    for day, route in enumerate(routes, start=1):
+        urutan.extend(route)
+        hari.extend([day] * len(route))
+    return np.array(urutan, dtype=np.int64), np.array(hari, dtype=np.int64)
@@ -0,0 +1,96 @@
+# Runtime inferensi NumPy untuk model Keras Dense (MLP) yang disimpan sebagai .h5.
+#
+# Bobot dibaca langsung dengan h5py dan setiap layer dievaluasi sebagai x @ kernel + bias,
+# sehingga server tidak perlu mengimpor TensorFlow/Keras sama sekali. Input boleh berupa
+# matriks scipy.sparse (TF-IDF CSR); layer pertama lalu dihitung sebagai perkalian
+# sparse-dense tanpa membentuk matriks input yang dense.
+#
+# Paritas terhadap Keras diuji di tests/test_runtime.py (butuh TensorFlow).
+import json
+import h5py
+import numpy as np
+
+def _linear(x):
+    return x
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+ACTIVATIONS = {
+    'linear': _linear,
+    'relu': _relu,
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+    'softmax': _softmax
+}
+
+# Layer tanpa bobot yang tidak berpengaruh saat inferensi
+PASSTHROUGH_LAYERS = {'InputLayer', 'Dropout'}
+
+class DenseModel:
+    def __init__(self, layers):
+        # layers: list of (kernel, bias, activation)
+        self.layers = layers
+        self.input_dim = layers[0][0].shape[0]
+        self.output_dim = layers[-1][0].shape[1]
+
+    @classmethod
+    def from_h5(cls, path):
+        with h5py.File(path, 'r') as file:
+            config = file.attrs['model_config']
+            if isinstance(config, bytes):
+                config = config.decode('utf-8')
+            config = json.loads(config)
+            weights = file['model_weights']
+
+            layers = []
+            for layer in config['config']['layers']:
+                class_name = layer['class_name']
+                layer_config = layer['config']
+                if class_name in PASSTHROUGH_LAYERS:
+                    continue
+                if class_name == 'Activation':
+                    kernel, bias, _ = layers.pop()
+                    layers.append((kernel, bias, layer_config['activation']))
+                    continue
+                if class_name != 'Dense':
+                    raise ValueError(f"Unsupported layer {class_name} in {path}")
+
+                name = layer_config['name']
+                group = weights[name]
+                weight_names = [n.decode('utf-8') if isinstance(n, bytes) else n for n in group.attrs['weight_names']]
+                kernel = np.asarray(group[weight_names[0]], dtype=np.float32)
+                if layer_config.get('use_bias', True):
+                    bias = np.asarray(group[weight_names[1]], dtype=np.float32)
+                else:
+                    bias = np.zeros(kernel.shape[1], dtype=np.float32)
+
+                activation = layer_config.get('activation', 'linear')
+                if activation not in ACTIVATIONS:
+                    raise ValueError(f"Unsupported activation {activation} in {path}")
+                layers.append((kernel, bias, activation))
+
+        return cls(layers)
+
+    def predict(self, x, batch_size=None):
+        # batch_size diterima agar kompatibel dengan model.predict Keras, tapi tidak dipakai
+        layers = self.layers
+        if hasattr(x, 'tocsr'):
+            kernel, bias, activation = layers[0]
+            x = ACTIVATIONS[activation](np.asarray(x.tocsr().astype(np.float32) @ kernel) + bias)
+            layers = layers[1:]
+        else:
+            x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in layers:
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return x
+
+def load_model(path):
+    return DenseModel.from_h5(path)
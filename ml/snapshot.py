@@ -0,0 +1,116 @@
+# Snapshot biner bertipe dari dataset CSV.
+#
+# Setiap CSV diparse sekali menjadi file .npz berisi satu array per kolom (tanpa pickle),
+# termasuk kolom yang dikonversi ke angka seperti total_review ("2,189" -> 2189.0) dan
+# total_rating ("4.0 of 5 bubbles" -> 4.0). Pembacaan berikutnya memuat array tersebut
+# langsung; snapshot dibangun ulang otomatis jika mtime atau ukuran CSV berubah.
+#
+# Membangun ulang semua snapshot, dijalankan dari root repository:
+#
+#     python -m ml.snapshot
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+
+# Naikkan jika cara parsing atau layout snapshot berubah; snapshot dengan format lain dibangun ulang
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_DIR = os.getenv('WISNU_SNAPSHOT_DIR', 'ml/artifacts/snapshots')
+
+# "2,189" -> 2189.0; float supaya nilai kosong tetap NaN seperti kolom numerik read_csv
+def parse_count(values):
+    return pd.to_numeric(values.astype(str).str.replace(',', '', regex=False), errors='coerce').astype(np.float64)
+
+# "4.0 of 5 bubbles" -> 4.0
+def parse_bubbles(values):
+    return pd.to_numeric(values.astype(str).str.extract(r'^\s*(\d+(?:\.\d+)?)', expand=False), errors='coerce').astype(np.float64)
+
+# Dataset yang dikenal beserta konversi kolomnya
+DATASETS = {
+    'ml/itinerary/wisataindonesia.csv': {'total_review': parse_count, 'total_rating': parse_bubbles},
+    'ml/itinerary/category.csv': {},
+    'ml/guides/local_guide.csv': {},
+    'ml/guides/review.csv': {},
+    'events.csv': {}
+}
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def snapshot_path(path, snapshot_dir=SNAPSHOT_DIR):
+    name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(snapshot_dir, f'{name}-{digest}.npz')
+
+# Menyimpan DataFrame sebagai satu array per kolom. Kolom teks disimpan sebagai array
+# unicode ditambah mask nilai kosong sehingga file bisa dibuka tanpa allow_pickle.
+def save_columns(frame, path, source=None):
+    arrays = {'__format__': np.array(SNAPSHOT_FORMAT), '__columns__': np.array(list(frame.columns), dtype=str)}
+    if source is not None:
+        arrays['__source__'] = np.array(source, dtype=np.int64)
+    for position, column in enumerate(frame.columns):
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            arrays[f'values_{position}'] = values.to_numpy()
+        else:
+            arrays[f'values_{position}'] = values.fillna('').astype(str).to_numpy(dtype=str)
+            arrays[f'missing_{position}'] = values.isna().to_numpy()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Nama sementara per proses karena beberapa worker bisa membangun snapshot yang sama bersamaan
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_path, path)
+
+# Mengembalikan (DataFrame, source stamp atau None)
+def load_columns(path):
+    with np.load(path, allow_pickle=False) as snapshot:
+        if int(snapshot['__format__']) != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path}: snapshot format {int(snapshot['__format__'])} != {SNAPSHOT_FORMAT}")
+        columns = snapshot['__columns__'].tolist()
+        data = {}
+        for position, column in enumerate(columns):
+            values = snapshot[f'values_{position}']
+            if f'missing_{position}' in snapshot.files:
+                values = values.astype(object)
+                values[snapshot[f'missing_{position}']] = np.nan
+            data[column] = values
+        source = snapshot['__source__'].tolist() if '__source__' in snapshot.files else None
+    return pd.DataFrame(data, columns=columns), source
+
+def parse_csv(path):
+    frame = pd.read_csv(path)
+    for column, parse in DATASETS.get(os.path.normpath(path).replace(os.sep, '/'), {}).items():
+        frame[column] = parse(frame[column])
+    return frame
+
+# Pengganti pd.read_csv untuk dataset: dari snapshot jika CSV tidak berubah sejak snapshot
+# dibuat, selain itu CSV diparse lalu snapshot ditulis ulang
+def read_dataset(path, snapshot_dir=SNAPSHOT_DIR):
+    source = _source_stamp(path)
+    target = snapshot_path(path, snapshot_dir)
+
+    if os.path.exists(target):
+        try:
+            frame, snapshot_source = load_columns(target)
+            if snapshot_source == source:
+                return frame
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Rebuilding snapshot {target}: {e}")
+
+    frame = parse_csv(path)
+    try:
+        save_columns(frame, target, source)
+    except OSError as e:
+        # Mis. filesystem read-only di App Engine; tetap pakai hasil parse CSV
+        print(f"Could not write snapshot {target}: {e}")
+    return frame
+
+if __name__ == '__main__':
+    for path in DATASETS:
+        frame = parse_csv(path)
+        target = snapshot_path(path)
+        save_columns(frame, target, _source_stamp(path))
+        print(f"{path}: {frame.shape[0]} rows x {frame.shape[1]} columns -> {target}")
@@ -0,0 +1,82 @@
+# Indeks spasial grid lintang/bujur di memori untuk pencarian titik dalam radius dan
+# k titik terdekat.
+#
+# Titik dikelompokkan ke sel berukuran cell_size derajat. Query radius hanya menghitung
+# jarak haversine untuk titik di sel-sel yang bisa berada dalam radius; k terdekat
+# memakai query radius yang diperbesar sampai minimal k titik ditemukan. Untuk radius
+# yang mencakup hampir semua sel, jarak dihitung langsung untuk semua titik.
+#
+# Benchmark, dijalankan dari root repository:
+#
+#     python benchmarks/spatial.py
+import math
+import numpy as np
+from ml.geo import R, distances_from
+
+# Panjang satu derajat lintang dalam km
+KM_PER_DEGREE = math.pi * R / 180
+
+class GridIndex:
+    def __init__(self, latitudes, longitudes, cell_size=0.25):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_size = cell_size
+
+        # Titik tanpa koordinat tidak pernah ditemukan
+        valid = np.flatnonzero(np.isfinite(self.latitudes) & np.isfinite(self.longitudes))
+        self.valid_rows = valid
+        cell_lats = np.floor(self.latitudes[valid] / cell_size).astype(np.int64)
+        cell_lons = np.floor(self.longitudes[valid] / cell_size).astype(np.int64)
+
+        # Baris diurutkan per sel sehingga isi setiap sel adalah satu potongan array
+        order = np.lexsort((valid, cell_lons, cell_lats))
+        self.rows = valid[order]
+        keys = np.stack((cell_lats[order], cell_lons[order]), axis=1)
+        boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(order)]))
+        self.cells = {(int(keys[s, 0]), int(keys[s, 1])): (int(s), int(e)) for s, e in zip(starts, ends)} if len(order) else {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Baris kandidat dari semua sel yang bisa berada dalam radius_km dari (lat, lon)
+    def _candidates(self, lat, lon, radius_km):
+        lat_span = radius_km / KM_PER_DEGREE
+        # Lebar satu derajat bujur menyempit ke arah kutub; pakai lintang terjauh dari ekuator di dalam radius
+        max_lat = min(abs(lat) + lat_span, 90)
+        lon_span = 360 if max_lat >= 89.9 else min(radius_km / (KM_PER_DEGREE * math.cos(math.radians(max_lat))), 360)
+
+        lat_range = range(math.floor((lat - lat_span) / self.cell_size), math.floor((lat + lat_span) / self.cell_size) + 1)
+        lon_range = range(math.floor((lon - lon_span) / self.cell_size), math.floor((lon + lon_span) / self.cell_size) + 1)
+        # Sel di sekitar bujur +-180 dan radius besar: lebih murah menghitung semua titik
+        if lon_span >= 180 or lon - lon_span < -180 or lon + lon_span > 180 or len(lat_range) * len(lon_range) > len(self.cells):
+            return self.valid_rows
+
+        slices = [self.cells[(cell_lat, cell_lon)] for cell_lat in lat_range for cell_lon in lon_range if (cell_lat, cell_lon) in self.cells]
+        if not slices:
+            return np.array([], dtype=np.int64)
+        return np.sort(np.concatenate([self.rows[start:end] for start, end in slices]))
+
+    # (baris, jarak km) untuk semua titik dalam radius_km, urut dari yang terdekat
+    def within(self, lat, lon, radius_km):
+        rows = self._candidates(lat, lon, radius_km)
+        distances = distances_from(lat, lon, self.latitudes[rows], self.longitudes[rows])
+        inside = distances <= radius_km
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    # (baris, jarak km) untuk k titik terdekat, urut dari yang terdekat
+    def nearest(self, lat, lon, k):
+        if k <= 0 or not len(self.rows):
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+        radius_km = self.cell_size * KM_PER_DEGREE
+        while radius_km < math.pi * R:
+            rows, distances = self.within(lat, lon, radius_km)
+            if len(rows) >= k:
+                return rows[:k], distances[:k]
+            radius_km *= 2
+        rows, distances = self.within(lat, lon, math.pi * R)
+        return rows[:k], distances[:k]
@@ -0,0 +1,43 @@
+# Stand-ins for mysql.connector connections. Every query is recorded on the connection and
+# answered with the connection's rows: a list, or a function of the query returning one.
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, query, params=()):
+        self.connection.queries.append(query)
+        rows = self.connection.rows
+        self.rows = rows(query) if callable(rows) else rows
+
+    def executemany(self, query, seq_params):
+        self.connection.queries.append(query)
+        self.rows = []
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+class StubConnection:
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.queries = []
+        self.commits = 0
+        self.in_transaction = False
+
+    def cursor(self, **kwargs):
+        return StubCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def ping(self, reconnect=False):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
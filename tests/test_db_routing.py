@@ -0,0 +1,118 @@
+# Reads go to the replica, registration and order creation to the primary, and a request
+# keeps reading from the primary once it wrote. Only a failed connect, not a busy pool,
+# makes reads skip the replica. Both databases are stub pools whose connections record
+# every query.
+#
+# Run from the repository root:
+#
+#     python -m pytest tests
+import datetime
+import itertools
+import os
+import sys
+
+import jwt
+import mysql.connector
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-for-the-routing-tests')
+
+import app as wisnu
+from db import ConnectionPool, PoolTimeout
+from stubs import StubConnection
+
+def respond(query):
+    if 'FROM tickets' in query:
+        return [{"id": 1, "is_active": 1, "created_at": datetime.datetime(2023, 6, 1), "poi_id": 7, "poi_name": "POI 7", "poi_location": "Bandung"}]
+    if 'FROM pois' in query:
+        return [{"id": "7", "name": "POI 7", "location": "Bandung", "adult_price": 10000, "child_price": 5000}]
+    if 'SELECT created_at FROM users' in query:
+        return [{"created_at": datetime.datetime(2023, 6, 1)}]
+    return []
+
+@pytest.fixture
+def databases(monkeypatch):
+    primary = StubConnection(respond)
+    replica = StubConnection(respond)
+    monkeypatch.setattr(wisnu, 'DB_REPLICA_HOST', 'replica')
+    monkeypatch.setattr(wisnu, 'replica_down_until', 0.0)
+    monkeypatch.setattr(wisnu, 'db_pools', {
+        'primary': ConnectionPool('test-routing-primary', lambda: primary, size=1),
+        'replica': ConnectionPool('test-routing-replica', lambda: replica, size=1)
+    })
+    ids = itertools.count(1)
+    monkeypatch.setattr(wisnu, 'next_id', lambda: next(ids))
+    return primary, replica
+
+@pytest.fixture
+def client():
+    token = jwt.encode({'id': 1}, wisnu.app.config['SECRET_KEY'], algorithm='HS256')
+    return wisnu.app.test_client(), {'Authorization': f'Bearer {token}'}
+
+def test_reads_use_the_replica(databases, client):
+    primary, replica = databases
+    test_client, headers = client
+
+    response = test_client.get('/tickets?filter=all', headers=headers)
+
+    assert response.status_code == 200
+    assert len(replica.queries) == 1
+    assert primary.queries == []
+
+def test_register_uses_the_primary(databases, client):
+    primary, replica = databases
+    test_client, _ = client
+
+    response = test_client.post('/auth/register', json={
+        "name": "Test", "email": "test@example.com", "phone_number": "0812", "password": "secret", "interests": ["alam"]
+    })
+
+    assert response.status_code == 200
+    assert [query.split()[0] for query in primary.queries] == ['SELECT', 'INSERT', 'SELECT']
+    assert primary.commits == 1
+    assert replica.queries == []
+
+def test_create_order_uses_the_primary(databases, client):
+    primary, replica = databases
+    test_client, headers = client
+
+    response = test_client.post('/transaction/new', headers=headers, json={
+        "ticket": [{"poi_id": 7, "num_adult": 2, "num_child": 1}]
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['data']['ticket'][0]['poi']['id'] == 7
+    assert len(primary.queries) == 3
+    assert primary.commits == 1
+    assert replica.queries == []
+
+def test_reads_after_a_write_stay_on_the_primary(databases):
+    primary, replica = databases
+
+    with wisnu.app.app_context():
+        assert wisnu.get_db() is replica
+        assert wisnu.get_db(write=True) is primary
+        assert wisnu.get_db() is primary
+
+def test_failed_replica_connect_sends_reads_to_the_primary(databases, monkeypatch):
+    primary, _ = databases
+
+    def refuse():
+        raise mysql.connector.errors.InterfaceError("Can't connect to MySQL server")
+
+    monkeypatch.setattr(wisnu, 'db_pools', dict(wisnu.db_pools, replica=ConnectionPool('test-routing-down', refuse, size=1)))
+
+    with wisnu.app.app_context():
+        assert wisnu.get_db() is primary
+    assert wisnu.replica_down_until > 0
+
+def test_busy_replica_is_not_treated_as_down(databases, monkeypatch):
+    replica_pool = ConnectionPool('test-routing-busy', lambda: StubConnection(), size=1, timeout=0)
+    replica_pool.acquire()
+    monkeypatch.setattr(wisnu, 'db_pools', dict(wisnu.db_pools, replica=replica_pool))
+
+    with wisnu.app.app_context():
+        with pytest.raises(PoolTimeout):
+            wisnu.get_db()
+    assert wisnu.replica_down_until == 0.0
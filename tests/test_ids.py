@@ -0,0 +1,233 @@
+# IdGenerator must never hand out the same ID twice: not when the sequence of a millisecond
+# runs out, not when the clock goes backwards, not from concurrent threads, and not from
+# two processes after one of them lost its worker id lock. MySQL named locks are replaced
+# by a fake server shared by fake connections, and time by a manual clock.
+#
+# Run from the repository root:
+#
+#     python -m pytest tests
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ids import EPOCH_MS, LOCK_PREFIX, MAX_SEQUENCE, IdGenerator, WorkerLease, parse_id
+
+class Clock:
+    def __init__(self, now=EPOCH_MS / 1000 + 1000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class LockServer:
+    def __init__(self):
+        self.locks = {}
+        self.next_connection_id = 1
+
+    def connect(self):
+        connection = LockConnection(self, self.next_connection_id)
+        self.next_connection_id += 1
+        return connection
+
+    # The server forgets every lock, as after a restart or failover
+    def restart(self):
+        self.locks.clear()
+
+class LockCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.row = None
+
+    def execute(self, query, params=()):
+        self.row = (self.connection.query(query, params[0]),)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+class LockConnection:
+    def __init__(self, server, connection_id):
+        self.server = server
+        self.connection_id = connection_id
+        self.lost = False
+
+    def cursor(self):
+        if self.lost:
+            raise OSError("Lost connection to MySQL server")
+        return LockCursor(self)
+
+    def query(self, query, name):
+        locks = self.server.locks
+        if query.startswith("SELECT GET_LOCK"):
+            if locks.get(name, self.connection_id) != self.connection_id:
+                return 0
+            locks[name] = self.connection_id
+            return 1
+        if query.startswith("SELECT IS_USED_LOCK"):
+            return int(locks.get(name) == self.connection_id)
+        raise AssertionError(f"unexpected query {query}")
+
+    # The server dropped the connection (wait_timeout, network): its locks are freed
+    def drop(self):
+        self.lost = True
+        self.close()
+
+    def close(self):
+        for name, holder in list(self.server.locks.items()):
+            if holder == self.connection_id:
+                del self.server.locks[name]
+
+def holder_of(server, worker_id):
+    return server.locks.get(f'{LOCK_PREFIX}{worker_id}')
+
+def test_ids_increase_and_carry_the_worker_id():
+    clock = Clock()
+    generator = IdGenerator(worker_id=5, clock=clock)
+    started = clock.now
+
+    ids = []
+    for _ in range(3):
+        ids.append(generator.next_id())
+        clock.now += 0.001
+
+    assert ids == sorted(ids)
+    assert [parse_id(value)[1] for value in ids] == [5, 5, 5]
+    assert parse_id(ids[0])[0] == int(started * 1000)
+
+def test_sequence_overflow_borrows_the_next_millisecond():
+    generator = IdGenerator(worker_id=1, clock=Clock())
+
+    ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 3)]
+
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    first_ms = parse_id(ids[0])[0]
+    assert parse_id(ids[MAX_SEQUENCE])[0] == first_ms
+    assert parse_id(ids[MAX_SEQUENCE + 1])[0] == first_ms + 1
+    assert parse_id(ids[MAX_SEQUENCE + 1])[2] == 0
+
+def test_clock_going_backwards_does_not_repeat_ids():
+    clock = Clock()
+    generator = IdGenerator(worker_id=1, clock=clock)
+
+    before = [generator.next_id() for _ in range(10)]
+    clock.now -= 5
+    after = [generator.next_id() for _ in range(10)]
+
+    assert len(set(before + after)) == 20
+    assert after[0] > before[-1]
+
+def test_threads_get_unique_ids():
+    generator = IdGenerator(worker_id=3)
+    results = [[] for _ in range(8)]
+
+    def worker(out):
+        for _ in range(5000):
+            out.append(generator.next_id())
+
+    threads = [threading.Thread(target=worker, args=(out,)) for out in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [value for out in results for value in out]
+    assert len(set(ids)) == len(ids) == 8 * 5000
+    assert all(out == sorted(out) for out in results)
+
+def test_worker_id_out_of_range_is_rejected():
+    with pytest.raises(ValueError):
+        IdGenerator(worker_id=1024)
+
+def test_processes_lease_different_worker_ids():
+    server = LockServer()
+    clock = Clock()
+    first = WorkerLease(server.connect, clock=clock, sleep=clock.sleep)
+    second = WorkerLease(server.connect, clock=clock, sleep=clock.sleep)
+
+    assert first.worker_id() != second.worker_id()
+
+def test_new_lease_waits_before_its_first_id():
+    server = LockServer()
+    clock = Clock()
+    lease = WorkerLease(server.connect, check_interval=2, clock=clock, sleep=clock.sleep)
+    started = clock.now
+
+    lease.worker_id()
+
+    assert clock.now - started >= 2
+
+def test_lease_is_rechecked_only_after_the_interval():
+    server = LockServer()
+    clock = Clock()
+    lease = WorkerLease(server.connect, check_interval=2, clock=clock, sleep=clock.sleep)
+    worker_id = lease.worker_id()
+    connection = lease._connection
+
+    clock.now += 1
+    connection.drop()
+    # Still within the interval of the last check: served without a query
+    assert lease.worker_id() == worker_id
+
+    clock.now += 1
+    # Overdue: the check fails on the dropped connection and a new lock is taken
+    assert lease.worker_id() == worker_id
+    assert lease._connection is not connection
+    assert holder_of(server, worker_id) == lease._connection.connection_id
+
+def test_lost_lease_never_overlaps_with_the_new_holder():
+    server = LockServer()
+    clock = Clock()
+    first = WorkerLease(server.connect, check_interval=2, clock=clock, sleep=clock.sleep)
+    second = WorkerLease(server.connect, check_interval=2, clock=clock, sleep=clock.sleep)
+    worker_id = first.worker_id()
+    first_valid_until = clock.now + 2
+
+    # The primary restarts: the lock is free, and until its next check the first process
+    # still issues IDs under it
+    clock.now += 1
+    server.restart()
+    assert first.worker_id() == worker_id
+
+    # Another process takes the same worker id, but only uses it after the first one stopped
+    assert second.worker_id() == worker_id
+    assert clock.now >= first_valid_until
+
+    # The first process notices at its next check and moves to another worker id
+    assert first.worker_id() != worker_id
+    assert holder_of(server, worker_id) == second._connection.connection_id
+
+def test_lease_fails_closed_when_the_database_is_unreachable():
+    server = LockServer()
+    clock = Clock()
+    reachable = [True]
+
+    def connect():
+        if not reachable[0]:
+            raise OSError("Can't connect to MySQL server")
+        return server.connect()
+
+    lease = WorkerLease(connect, check_interval=2, clock=clock, sleep=clock.sleep)
+    generator = IdGenerator(lease=lease, clock=clock)
+    generator.next_id()
+
+    reachable[0] = False
+    lease._connection.drop()
+    clock.now += 2
+
+    with pytest.raises(OSError):
+        generator.next_id()
+    with pytest.raises(OSError):
+        generator.next_id()
+
+    reachable[0] = True
+    assert parse_id(generator.next_id())[1] == lease.worker_id()
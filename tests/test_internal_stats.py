@@ -0,0 +1,44 @@
+# /internal/stats exposes cache, coalescing and pool internals, so it must only answer
+# requests carrying STATS_TOKEN, not any logged-in user.
+#
+# Run from the repository root:
+#
+#     python -m pytest tests
+import os
+import sys
+
+import jwt
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-for-the-stats-tests')
+
+import app as wisnu
+
+@pytest.fixture
+def test_client():
+    return wisnu.app.test_client()
+
+def user_headers():
+    token = jwt.encode({'id': 1}, wisnu.app.config['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+def test_disabled_without_stats_token(test_client, monkeypatch):
+    monkeypatch.setattr(wisnu, 'STATS_TOKEN', None)
+
+    assert test_client.get('/internal/stats', headers=user_headers()).status_code == 404
+    assert test_client.get('/internal/stats', headers={'X-Stats-Token': ''}).status_code == 404
+
+def test_logged_in_user_without_token_is_refused(test_client, monkeypatch):
+    monkeypatch.setattr(wisnu, 'STATS_TOKEN', 'operator-token')
+
+    assert test_client.get('/internal/stats', headers=user_headers()).status_code == 404
+    assert test_client.get('/internal/stats', headers={'X-Stats-Token': 'wrong'}).status_code == 404
+
+def test_stats_token_is_accepted(test_client, monkeypatch):
+    monkeypatch.setattr(wisnu, 'STATS_TOKEN', 'operator-token')
+
+    response = test_client.get('/internal/stats', headers={'X-Stats-Token': 'operator-token'})
+
+    assert response.status_code == 200
+    assert set(response.get_json()['data']) == {'caches', 'coalescing', 'db_pools'}
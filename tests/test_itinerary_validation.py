@@ -0,0 +1,47 @@
+# Malformed itinerary and trip requests must be rejected with 400 before any city is
+# looked up or any itinerary is planned, instead of failing with 500 or being coerced.
+#
+# Run from the repository root:
+#
+#     python -m pytest tests
+import os
+import sys
+
+import jwt
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-for-the-validation-tests')
+
+import app as wisnu
+
+@pytest.fixture
+def client():
+    token = jwt.encode({'id': 1}, wisnu.app.config['SECRET_KEY'], algorithm='HS256')
+    return wisnu.app.test_client(), {'Authorization': f'Bearer {token}'}
+
+@pytest.mark.parametrize('body', [
+    [1, 2],
+    {"cities": "12"},
+    {"cities": [1, "2"]},
+    {"cities": [True]},
+    {"cities": [1], "days": 2.5},
+    {"cities": [1], "days": "2"},
+    {"cities": [1, 2], "days": 1},
+    {"cities": [1], "days": wisnu.MAX_ITINERARY_DAYS + 1},
+    {"cities": [1], "keep_order": "yes"}
+])
+def test_trip_rejects_malformed_bodies(client, body):
+    test_client, headers = client
+
+    response = test_client.post('/trip', json=body, headers=headers)
+
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('days', ['0', '-1', '1.5', 'abc', str(wisnu.MAX_ITINERARY_DAYS + 1)])
+def test_city_itinerary_rejects_bad_days(client, days):
+    test_client, headers = client
+
+    response = test_client.get(f'/city/1/itinerary?days={days}', headers=headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+# The NumPy runtime in ml/runtime.py must give the same outputs as Keras for both served
+# models, with dense inputs and with the CSR TF-IDF matrices serving passes in (the sparse
+# first-layer path). Skipped when Keras/TensorFlow is not installed.
+#
+# Run from the repository root:
+#
+#     python -m pytest tests
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+keras = pytest.importorskip('keras')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ml.runtime import load_model
+
+ATOL = 1e-4
+
+def itinerary_inputs():
+    data = pd.read_csv(os.path.join(ROOT, 'ml/itinerary/wisataindonesia.csv'))
+    return sparse.hstack((
+        TfidfVectorizer().fit_transform(data['kota']),
+        TfidfVectorizer().fit_transform(data['provinsi'].fillna(''))
+    ), format='csr', dtype=np.float32)
+
+def guide_inputs():
+    data = pd.read_csv(os.path.join(ROOT, 'ml/guides/local_guide.csv'))
+    return TfidfVectorizer().fit_transform(data['Tempat'])
+
+MODELS = {
+    'itinerary': ('ml/itinerary/recommendation_model.h5', itinerary_inputs),
+    'guides': ('ml/guides/model_local_guide.h5', guide_inputs)
+}
+
+@pytest.fixture(scope='module', params=list(MODELS))
+def model(request):
+    path, inputs = MODELS[request.param]
+    path = os.path.join(ROOT, path)
+    return keras.models.load_model(path), load_model(path), inputs()
+
+def test_tfidf_dense(model):
+    keras_model, runtime_model, inputs = model
+    dense = inputs.toarray()
+    np.testing.assert_allclose(runtime_model.predict(dense), keras_model.predict(dense, verbose=0), atol=ATOL)
+
+def test_tfidf_csr(model):
+    keras_model, runtime_model, inputs = model
+    np.testing.assert_allclose(runtime_model.predict(inputs), keras_model.predict(inputs.toarray(), verbose=0), atol=ATOL)
+
+def test_random_dense(model):
+    keras_model, runtime_model, inputs = model
+    x = np.random.default_rng(0).random(inputs.shape, dtype=np.float32)
+    np.testing.assert_allclose(runtime_model.predict(x), keras_model.predict(x, verbose=0), atol=ATOL)
+
+def test_random_csr(model):
+    keras_model, runtime_model, inputs = model
+    x = sparse.random(*inputs.shape, density=0.05, format='csr', dtype=np.float32, random_state=0)
+    np.testing.assert_allclose(runtime_model.predict(x), keras_model.predict(x.toarray(), verbose=0), atol=ATOL)
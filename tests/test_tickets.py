@@ -0,0 +1,51 @@
+# list_tickets must resolve the POIs of all tickets in the same query, so the number of
+# queries does not grow with the number of tickets. The database is replaced by a stub
+# pool whose cursors record every query.
+#
+# Run from the repository root:
+#
+#     python -m pytest tests
+import datetime
+import os
+import sys
+
+import jwt
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-for-the-ticket-tests')
+
+import app as wisnu
+from db import ConnectionPool
+from stubs import StubConnection
+
+def ticket_rows(count):
+    return [{
+        "id": ticket_id,
+        "is_active": 1,
+        "created_at": datetime.datetime(2023, 6, 1, 10, 0, 0),
+        "poi_id": ticket_id % 7,
+        "poi_name": f"POI {ticket_id % 7}",
+        "poi_location": "Bandung"
+    } for ticket_id in range(count)]
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(wisnu, 'DB_REPLICA_HOST', None)
+    monkeypatch.setattr(wisnu, 'db_pools', {})
+    token = jwt.encode({'id': 1}, wisnu.app.config['SECRET_KEY'], algorithm='HS256')
+    return wisnu.app.test_client(), {'Authorization': f'Bearer {token}'}
+
+@pytest.mark.parametrize('count', [1, 50])
+def test_list_tickets_issues_one_query(client, count):
+    test_client, headers = client
+    connection = StubConnection(ticket_rows(count))
+    wisnu.db_pools['primary'] = ConnectionPool('test-tickets', lambda: connection, size=1)
+
+    response = test_client.get('/tickets?filter=all', headers=headers)
+
+    assert response.status_code == 200
+    tickets = response.get_json()['data']
+    assert len(tickets) == count
+    assert tickets[-1]['poi'] == {"id": (count - 1) % 7, "name": f"POI {(count - 1) % 7}", "location": "Bandung"}
+    assert len(connection.queries) == 1